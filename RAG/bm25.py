@@ -0,0 +1,125 @@
+# bm25.py
+#
+# Okapi BM25 over the chunk texts of the index snapshot. ingest.py builds it
+# next to vectors.npy (bm25.npz, same row order) so exact fashion terms
+# ("mocha mousse", "barrel jeans") can be matched without an embedding call.
+import os
+import re
+
+import numpy as np
+
+LEXICAL_FAST_PATH = os.getenv("RAG_LEXICAL_FAST_PATH", "1") != "0"
+LEXICAL_MAX_TERMS = int(os.getenv("RAG_LEXICAL_MAX_TERMS", 4))
+LEXICAL_MAX_DF = float(os.getenv("RAG_LEXICAL_MAX_DF", 0.5))
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from how i in is it its me my of on or
+our should so that the their them these they this to us was we were what when which
+who why will with you your about any some tell show give find
+""".split())
+
+
+def tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def query_terms(text):
+    """Distinct non-stopword terms, in query order."""
+    return list(dict.fromkeys(t for t in tokenize(text) if t not in STOPWORDS))
+
+
+class BM25Index:
+    def __init__(self, terms, offsets, rows, tfs, doc_lengths, k1=1.2, b=0.75):
+        # CSR-style postings: term i -> rows[offsets[i]:offsets[i+1]] (sorted) with tfs
+        self.term_ids = {t: i for i, t in enumerate(terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        n = len(doc_lengths)
+        self.avg_length = float(doc_lengths.mean()) if n else 0.0
+        df = np.diff(offsets).astype(np.float32)
+        self.df = df
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    @classmethod
+    def build(cls, documents, **kwargs):
+        postings = {}
+        doc_lengths = np.zeros(len(documents), dtype=np.float32)
+        for row, text in enumerate(documents):
+            tokens = tokenize(text)
+            doc_lengths[row] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((row, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[t]) for t in terms])
+        rows = np.fromiter((r for t in terms for r, _ in postings[t]), dtype=np.int32, count=offsets[-1])
+        tfs = np.fromiter((tf for t in terms for _, tf in postings[t]), dtype=np.float32, count=offsets[-1])
+        return cls(terms, offsets, rows, tfs, doc_lengths, **kwargs)
+
+    def save(self, f):
+        terms = sorted(self.term_ids, key=self.term_ids.get)
+        np.savez(f, terms=np.array(terms, dtype=str), offsets=self.offsets, rows=self.rows,
+                 tfs=self.tfs, doc_lengths=self.doc_lengths)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["terms"].tolist(), data["offsets"], data["rows"], data["tfs"], data["doc_lengths"])
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def _postings(self, term):
+        i = self.term_ids.get(term)
+        if i is None:
+            return None, None, 0.0
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return self.rows[lo:hi], self.tfs[lo:hi], self.idf[i]
+
+    def search(self, query, k):
+        """Top-k (row, score) pairs, best first."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in query_terms(query):
+            rows, tfs, idf = self._postings(term)
+            if rows is None:
+                continue
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / self.avg_length)
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        matched = np.flatnonzero(scores)
+        if len(matched) == 0:
+            return []
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(int(r), float(scores[r])) for r in top]
+
+    def confident(self, query, hits):
+        """True when a short keyword query is fully matched by the top hit and
+        every term is selective, so the vector search can be skipped."""
+        terms = query_terms(query)
+        if not hits or not terms or len(terms) > LEXICAL_MAX_TERMS:
+            return False
+        top = hits[0][0]
+        for term in terms:
+            rows, _, _ = self._postings(term)
+            if rows is None or self.df[self.term_ids[term]] > LEXICAL_MAX_DF * len(self):
+                return False
+            i = np.searchsorted(rows, top)
+            if i == len(rows) or rows[i] != top:
+                return False
+        return True
+
+
+def reciprocal_rank_fusion(rankings, k, c=60):
+    """Merge ranked [(row, score)] lists by sum of 1 / (c + rank)."""
+    fused = {}
+    for ranking in rankings:
+        for rank, (row, _) in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (c + rank + 1)
+    return sorted(fused.items(), key=lambda item: -item[1])[:k]
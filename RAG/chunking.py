@@ -0,0 +1,87 @@
+# chunking.py
+import os
+import re
+from dataclasses import dataclass
+
+# Sentence boundary: end punctuation followed by whitespace, or a line break
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\s*\n\s*")
+_TOKEN = re.compile(r"\S+")
+
+CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", 200))
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", 40))
+
+
+@dataclass
+class Chunk:
+    text: str
+    start: int  # character offsets into the source document
+    end: int
+    index: int
+
+
+def count_tokens(text):
+    # Whitespace tokens: a cheap, model-agnostic stand-in for subword tokens
+    return len(_TOKEN.findall(text))
+
+
+def split_sentences(text):
+    """Return (start, end) spans of the non-empty sentences/lines in text."""
+    spans, pos = [], 0
+    for m in _BOUNDARY.finditer(text):
+        if m.start() > pos:
+            spans.append((pos, m.start()))
+        pos = m.end()
+    if pos < len(text) and text[pos:].strip():
+        spans.append((pos, len(text)))
+    return spans
+
+
+def _split_long(text, start, end, max_tokens):
+    """Break one over-long sentence into max_tokens word windows."""
+    words = list(_TOKEN.finditer(text, start, end))
+    return [
+        (words[i].start(), words[min(i + max_tokens, len(words)) - 1].end())
+        for i in range(0, len(words), max_tokens)
+    ]
+
+
+def chunk_document(text, max_tokens=None, overlap_tokens=None):
+    """Group whole sentences into chunks of at most max_tokens, repeating
+    roughly overlap_tokens of trailing sentences at the start of the next
+    chunk so a fact that straddles a boundary is retrievable from either."""
+    max_tokens = max_tokens or CHUNK_TOKENS
+    overlap_tokens = CHUNK_OVERLAP if overlap_tokens is None else overlap_tokens
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    units = []  # (start, end, tokens)
+    for start, end in split_sentences(text):
+        n = count_tokens(text[start:end])
+        if n > max_tokens:
+            for s, e in _split_long(text, start, end, max_tokens):
+                units.append((s, e, count_tokens(text[s:e])))
+        elif n:
+            units.append((start, end, n))
+
+    chunks, window, window_tokens = [], [], 0
+    for unit in units:
+        if window and window_tokens + unit[2] > max_tokens:
+            chunks.append(window)
+            # carry trailing sentences forward as overlap
+            carry, carry_tokens = [], 0
+            for prev in reversed(window):
+                if carry_tokens + prev[2] > overlap_tokens:
+                    break
+                carry.insert(0, prev)
+                carry_tokens += prev[2]
+            while carry and carry_tokens + unit[2] > max_tokens:
+                carry_tokens -= carry.pop(0)[2]
+            window, window_tokens = carry, carry_tokens
+        window.append(unit)
+        window_tokens += unit[2]
+    if window:
+        chunks.append(window)
+
+    return [
+        Chunk(text=text[w[0][0]:w[-1][1]], start=w[0][0], end=w[-1][1], index=i)
+        for i, w in enumerate(chunks)
+    ]
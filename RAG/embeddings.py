@@ -0,0 +1,110 @@
+# embeddings.py
+import os
+import re
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBED_MODEL = "gemini-embedding-001"
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/openai/")
+
+
+# -----------------------------
+# Remote embedder (Gemini, OpenAI-compatible API)
+# -----------------------------
+class GeminiEmbedder:
+    """Embeds many texts per request, with a few requests in flight at once."""
+
+    def __init__(self, client, model=EMBED_MODEL, batch_size=100, max_concurrency=4, async_client=None):
+        self.client = client
+        self.async_client = async_client
+        self.model = model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+
+    def _embed_batch(self, texts):
+        resp = self.client.embeddings.create(model=self.model, input=texts)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    def embed(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            results = pool.map(self._embed_batch, batches)
+        return [emb for batch in results for emb in batch]
+
+    async def aembed(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        limit = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_batch(batch):
+            async with limit:
+                resp = await self.async_client.embeddings.create(model=self.model, input=batch)
+            return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+        results = await asyncio.gather(*(embed_batch(b) for b in batches))
+        return [emb for batch in results for emb in batch]
+
+
+# -----------------------------
+# Deterministic local embedder (no network)
+# -----------------------------
+class FakeEmbedder:
+    """Hashed bag-of-words vectors: stable across runs, and texts sharing
+    words land close together, so retrieval behaves sensibly offline."""
+
+    model = "fake"
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.calls = 0
+        self.texts_embedded = 0
+
+    def _vector(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            h = int.from_bytes(hashlib.md5(token.encode()).digest()[:4], "little")
+            vec[h % self.dim] += 1.0 if h & 1 << 31 else -1.0
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def embed(self, texts):
+        texts = list(texts)
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        return [self._vector(t) for t in texts]
+
+    async def aembed(self, texts):
+        return self.embed(texts)
+
+
+def get_embedder(client=None, async_client=None):
+    """RAG_EMBEDDER=fake selects the offline embedder; otherwise Gemini.
+
+    Pass async_client (an AsyncOpenAI) to use aembed() from async code."""
+    if os.getenv("RAG_EMBEDDER", "gemini").lower() == "fake":
+        return FakeEmbedder()
+    if client is None and async_client is None:
+        from openai import OpenAI
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("Set GEMINI_API_KEY in your .env file")
+        client = OpenAI(api_key=api_key, base_url=GEMINI_BASE_URL)
+    return GeminiEmbedder(
+        client,
+        async_client=async_client,
+        batch_size=int(os.getenv("RAG_EMBED_BATCH_SIZE", 100)),
+        max_concurrency=int(os.getenv("RAG_EMBED_CONCURRENCY", 4)),
+    )
@@ -0,0 +1,90 @@
+# fake_gemini.py
+# Local stand-in for Gemini's OpenAI-compatible endpoint, for load tests and
+# offline runs of the RAG API.
+#
+#   uvicorn fake_gemini:app --port 5056
+#   GEMINI_BASE_URL=http://localhost:5056/v1beta/openai/ GEMINI_API_KEY=x uvicorn main:app
+#
+# FAKE_GEMINI_EMBED_MS / FAKE_GEMINI_CHAT_MS simulate upstream latency. With
+# stream=true the first token arrives after FAKE_GEMINI_TTFT_MS and the rest
+# are spread over the remaining chat latency.
+import os
+import json
+import time
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from embeddings import FakeEmbedder
+
+EMBED_LATENCY = float(os.getenv("FAKE_GEMINI_EMBED_MS", 50)) / 1000
+CHAT_LATENCY = float(os.getenv("FAKE_GEMINI_CHAT_MS", 300)) / 1000
+TTFT = float(os.getenv("FAKE_GEMINI_TTFT_MS", 100)) / 1000
+
+app = FastAPI(title="Fake Gemini")
+embedder = FakeEmbedder()
+stats = {"embeddings": 0, "embedding_inputs": 0, "chat": 0}
+
+
+@app.post("/v1beta/openai/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    stats["embeddings"] += 1
+    stats["embedding_inputs"] += len(inputs)
+    await asyncio.sleep(EMBED_LATENCY)
+    return {
+        "object": "list",
+        "model": body.get("model"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": vec}
+            for i, vec in enumerate(embedder.embed(inputs))
+        ],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
+
+
+@app.post("/v1beta/openai/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["chat"] += 1
+    question = body["messages"][-1]["content"].rsplit("Question:", 1)[-1].strip()
+    if body.get("stream"):
+        return StreamingResponse(stream_completion(body, question), media_type="text/event-stream")
+    await asyncio.sleep(CHAT_LATENCY)
+    return {
+        "id": f"fake-{stats['chat']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": f"Fake answer to: {question}"},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+async def stream_completion(body, question):
+    words = f"Fake answer to: {question}. Here is some more streamed text to simulate a longer reply.".split(" ")
+    step = max(CHAT_LATENCY - TTFT, 0) / len(words)
+    await asyncio.sleep(TTFT)
+    for i, word in enumerate(words):
+        if i:
+            await asyncio.sleep(step)
+        chunk = {
+            "id": f"fake-{stats['chat']}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
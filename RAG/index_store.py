@@ -0,0 +1,222 @@
+# index_store.py
+import os
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, replace
+
+import numpy as np
+from chromadb import PersistentClient
+
+from bm25 import BM25Index
+
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index"))
+COLLECTION_NAME = "market_trends"
+
+# Files written next to the Chroma store by ingest.py
+MANIFEST_FILE = "manifest.json"   # version stamp + index stats
+VECTORS_FILE = "vectors.npy"      # (n, dim) float32, unit-normalized rows
+CHUNKS_FILE = "chunks.jsonl"      # one {"id", "text", "meta"} per row, same order
+BM25_FILE = "bm25.npz"            # lexical inverted index over the same rows
+
+
+def _version(ids):
+    return hashlib.sha1("\n".join(ids).encode("utf-8")).hexdigest()[:16]
+
+
+def _atomic_write(path, write):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """One loaded version of the index. Rows of `vectors`, `ids`, `documents`,
+    `metadatas`, the BM25 index and the retriever all line up."""
+    manifest: dict = None
+    vectors: np.ndarray = None
+    ids: tuple = ()
+    documents: tuple = ()
+    metadatas: tuple = ()
+    bm25: BM25Index = None
+    retriever: object = None
+    load_seconds: float = None
+    manifest_mtime: float = None
+
+    @property
+    def version(self):
+        return self.manifest["version"] if self.manifest else "empty"
+
+    @property
+    def ready(self):
+        return bool(self.manifest and self.manifest["chunks"])
+
+
+EMPTY_SNAPSHOT = IndexSnapshot()
+
+
+class IndexStore:
+    """On-disk RAG index: a persistent Chroma collection plus a flat vector
+    snapshot that the API memory-maps at startup instead of re-embedding.
+
+    The loaded index is one IndexSnapshot; load() builds a new one and swaps
+    the `snapshot` reference under a lock, so callers take it once per
+    request and never see half of a reload."""
+
+    def __init__(self, index_dir=INDEX_DIR, retriever_factory=None):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self.chroma = PersistentClient(path=os.path.join(index_dir, "chroma"))
+        self.collection = self.chroma.get_or_create_collection(COLLECTION_NAME)
+        # retriever_factory(store, snapshot) -> retriever, built into each snapshot
+        self.retriever_factory = retriever_factory
+
+        self._lock = threading.Lock()          # guards the snapshot reference
+        self._load_lock = threading.RLock()    # one loader at a time
+        self._snapshot = EMPTY_SNAPSHOT
+
+    def path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    # -----------------------------
+    # Writing (ingest.py)
+    # -----------------------------
+    def write_snapshot(self, **extra):
+        """Export the whole collection to the flat snapshot and stamp a new version."""
+        data = self.collection.get(include=["embeddings", "documents", "metadatas"])
+        order = sorted(range(len(data["ids"])), key=lambda i: data["ids"][i])
+        ids = [data["ids"][i] for i in order]
+
+        vectors = np.asarray(data["embeddings"], dtype=np.float32)
+        if len(ids):
+            vectors = vectors[order]
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = np.ascontiguousarray(vectors / np.where(norms == 0, 1, norms))
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+
+        _atomic_write(self.path(VECTORS_FILE), lambda f: np.save(f, vectors))
+
+        def write_chunks(f):
+            for i in order:
+                row = {"id": data["ids"][i], "text": data["documents"][i], "meta": data["metadatas"][i]}
+                f.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+        _atomic_write(self.path(CHUNKS_FILE), write_chunks)
+        bm25 = BM25Index.build([data["documents"][i] for i in order])
+        _atomic_write(self.path(BM25_FILE), bm25.save)
+
+        manifest = {
+            "version": _version(ids),
+            "chunks": len(ids),
+            "dim": int(vectors.shape[1]) if len(ids) else 0,
+            "built_at": time.time(),
+            **extra,
+        }
+        # manifest last: readers treat its version as "snapshot complete"
+        _atomic_write(self.path(MANIFEST_FILE), lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+        return manifest
+
+    # -----------------------------
+    # Loading (API startup)
+    # -----------------------------
+    @property
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot
+
+    def _read_snapshot(self):
+        start = time.perf_counter()
+        try:
+            mtime = os.path.getmtime(self.path(MANIFEST_FILE))
+            with open(self.path(MANIFEST_FILE), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return self._read_chroma(start)
+
+        # mmap: pages are faulted in on first use rather than read up front
+        vectors = np.load(self.path(VECTORS_FILE), mmap_mode="r")
+        ids, documents, metadatas = [], [], []
+        with open(self.path(CHUNKS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                ids.append(row["id"])
+                documents.append(row["text"])
+                metadatas.append(row["meta"])
+        if os.path.exists(self.path(BM25_FILE)):
+            bm25 = BM25Index.load(self.path(BM25_FILE))
+        else:
+            # snapshot written before bm25.npz existed
+            bm25 = BM25Index.build(documents)
+
+        # touch Chroma once so its HNSW segment is loaded before the first request
+        if self.collection.count() and manifest["dim"]:
+            self.collection.query(query_embeddings=[[0.0] * manifest["dim"]], n_results=1, include=[])
+        return IndexSnapshot(manifest=manifest, vectors=vectors, ids=tuple(ids), documents=tuple(documents),
+                             metadatas=tuple(metadatas), bm25=bm25, manifest_mtime=mtime,
+                             load_seconds=time.perf_counter() - start)
+
+    def _read_chroma(self, start):
+        """No flat snapshot yet (collection filled before ingest.py wrote one):
+        serve the Chroma rows directly, without vectors."""
+        data = self.collection.get(include=["documents", "metadatas"])
+        if not data["ids"]:
+            return replace(EMPTY_SNAPSHOT, load_seconds=time.perf_counter() - start)
+        order = sorted(range(len(data["ids"])), key=lambda i: data["ids"][i])
+        ids = tuple(data["ids"][i] for i in order)
+        documents = tuple(data["documents"][i] for i in order)
+        manifest = {"version": _version(ids), "chunks": len(ids), "dim": 0, "built_at": None, "source": "chroma"}
+        return IndexSnapshot(manifest=manifest, ids=ids, documents=documents,
+                             metadatas=tuple(data["metadatas"][i] for i in order),
+                             bm25=BM25Index.build(documents), load_seconds=time.perf_counter() - start)
+
+    def load(self):
+        """Read the current snapshot from disk and make it the live one."""
+        with self._load_lock:
+            snapshot = self._read_snapshot()
+            if self.retriever_factory is not None:
+                snapshot = replace(snapshot, retriever=self.retriever_factory(self, snapshot))
+            with self._lock:
+                self._snapshot = snapshot
+        return snapshot.ready
+
+    def reload_if_changed(self):
+        """Pick up a re-ingest made by another process (cheap mtime check).
+
+        Safe to call from many threads: one of them reloads, the rest keep
+        using the current snapshot until the new one is swapped in."""
+        try:
+            mtime = os.path.getmtime(self.path(MANIFEST_FILE))
+        except FileNotFoundError:
+            return False
+        if mtime == self.snapshot.manifest_mtime:
+            return False
+        if not self._load_lock.acquire(blocking=False):
+            return False  # another thread is loading it
+        try:
+            if mtime == self.snapshot.manifest_mtime:
+                return False
+            return self.load()
+        finally:
+            self._load_lock.release()
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    def readiness(self):
+        snapshot = self.snapshot
+        manifest = snapshot.manifest
+        return {
+            "ready": snapshot.ready,
+            "index_dir": self.index_dir,
+            "version": snapshot.version,
+            "chunks": manifest["chunks"] if manifest else 0,
+            "dim": manifest["dim"] if manifest else 0,
+            "vector_bytes": int(snapshot.vectors.nbytes) if snapshot.vectors is not None else 0,
+            "load_seconds": round(snapshot.load_seconds, 4) if snapshot.load_seconds is not None else None,
+            "built_at": manifest.get("built_at") if manifest else None,
+            "retriever": snapshot.retriever.name if snapshot.retriever is not None else None,
+        }
@@ -1,66 +1,106 @@
 import os
+import hashlib
 from dotenv import load_dotenv
-from chromadb import Client
-from openai import OpenAI
+
+from chunking import CHUNK_OVERLAP, CHUNK_TOKENS, chunk_document
+from embeddings import get_embedder
+from index_store import MANIFEST_FILE, IndexStore
 
 # Load .env file
 load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError("Set GEMINI_API_KEY in your .env file")
 
-# Gemini client
-client = OpenAI(
-    api_key=API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
+# Embedder: Gemini by default, RAG_EMBEDDER=fake for an offline deterministic one
+embedder = get_embedder()
+
+# Persistent index under RAG_INDEX_DIR (Chroma store + versioned vector snapshot)
+store = IndexStore()
+collection = store.collection
 
-# Chroma client (v0.4+)
-chroma = Client()
-collection = chroma.get_or_create_collection("market_trends")
+UPSERT_BATCH_SIZE = 500
 
 # ----------------------------
-# Load & index documents
+# Chunk ids
 # ----------------------------
-def load_and_index(folder="./documents"):
-    files_indexed = 0
-    if not os.path.exists(folder):
-        raise ValueError(f"Documents folder not found: {folder}")
+def chunk_id(filename, chunk):
+    # Content-addressed: an edited chunk gets a new id, an unchanged one keeps its id.
+    # Changing RAG_CHUNK_TOKENS/RAG_CHUNK_OVERLAP or the embedder therefore
+    # re-indexes exactly what is affected.
+    key = f"{embedder.model}\0{filename}\0{chunk}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return f"{filename}#{digest}"
 
-    for filename in os.listdir(folder):
+
+# ----------------------------
+# Load & index documents
+# ----------------------------
+def read_chunks(folder):
+    """Return {chunk_id: (text, metadata)} for every .txt file in folder."""
+    chunks = {}
+    for filename in sorted(os.listdir(folder)):
         if not filename.endswith(".txt"):
             continue
 
         path = os.path.join(folder, filename)
         with open(path, "r", encoding="utf-8") as f:
-            text = f.read().strip()
-            if not text:
-                continue
-
-        # Skip already indexed
-        existing = collection.get(ids=[filename])
-        if existing["ids"]:
-            print(f"Skipping already indexed file: {filename}")
+            text = f.read()
+        if not text.strip():
             continue
 
-        # Create embedding
-        emb_resp = client.embeddings.create(
-            model="gemini-embedding-001",
-            input=text
-        )
-        emb = emb_resp.data[0].embedding
-
-        # Add to Chroma
-        collection.add(
-            documents=[text],
-            embeddings=[emb],
-            metadatas=[{"filename": filename}],
-            ids=[filename]
-        )
-        files_indexed += 1
-        print(f"Indexed: {filename}")
+        for chunk in chunk_document(text):
+            cid = chunk_id(filename, chunk.text)
+            chunks[cid] = (chunk.text, {
+                "filename": filename,
+                "chunk": chunk.index,
+                "start": chunk.start,
+                "end": chunk.end,
+            })
+    return chunks
 
-    print(f"\nDone! {files_indexed} new documents indexed.")
+
+def load_and_index(folder="./documents"):
+    if not os.path.exists(folder):
+        raise ValueError(f"Documents folder not found: {folder}")
+
+    wanted = read_chunks(folder)
+    stored = collection.get(include=["metadatas"])
+    existing = dict(zip(stored["ids"], stored["metadatas"]))
+
+    new_ids = [cid for cid in wanted if cid not in existing]
+    stale_ids = [cid for cid in existing if cid not in wanted]
+    # Same text, different position (e.g. a paragraph inserted above it):
+    # refresh the offsets without re-embedding
+    moved_ids = [cid for cid in wanted if cid in existing and existing[cid] != wanted[cid][1]]
+
+    # Embed only new/changed chunks, many per request
+    if new_ids:
+        embeddings = embedder.embed([wanted[cid][0] for cid in new_ids])
+        for start in range(0, len(new_ids), UPSERT_BATCH_SIZE):
+            ids = new_ids[start:start + UPSERT_BATCH_SIZE]
+            collection.upsert(
+                ids=ids,
+                documents=[wanted[cid][0] for cid in ids],
+                metadatas=[wanted[cid][1] for cid in ids],
+                embeddings=embeddings[start:start + UPSERT_BATCH_SIZE],
+            )
+
+    for start in range(0, len(moved_ids), UPSERT_BATCH_SIZE):
+        ids = moved_ids[start:start + UPSERT_BATCH_SIZE]
+        collection.update(ids=ids, metadatas=[wanted[cid][1] for cid in ids])
+
+    # Drop chunks whose source text changed or whose file was removed
+    for start in range(0, len(stale_ids), UPSERT_BATCH_SIZE):
+        collection.delete(ids=stale_ids[start:start + UPSERT_BATCH_SIZE])
+
+    unchanged = len(wanted) - len(new_ids)
+    if new_ids or stale_ids or moved_ids or not os.path.exists(store.path(MANIFEST_FILE)):
+        manifest = store.write_snapshot(
+            embed_model=embedder.model,
+            chunk_tokens=CHUNK_TOKENS,
+            chunk_overlap=CHUNK_OVERLAP,
+        )
+        print(f"Index version {manifest['version']} written to {store.index_dir}")
+    print(f"\nDone! {len(new_ids)} chunks embedded, {len(stale_ids)} removed, {unchanged} unchanged.")
+    return {"added": len(new_ids), "removed": len(stale_ids), "unchanged": unchanged}
 
 # ----------------------------
 # Run ingestion
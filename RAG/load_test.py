@@ -0,0 +1,170 @@
+# load_test.py
+# Throughput of /api/rag/query under concurrent load, against fake_gemini.
+#
+#   python load_test.py                         # 200 concurrent, 1000 queries
+#   python load_test.py --concurrency 500 --queries 2000 --chat-ms 1000
+#
+# Compares the two client paths on the same index and the same fake upstream:
+#
+#   sync  - the old route: a plain `def` endpoint calling the blocking OpenAI
+#           client (embed, then chat), one threadpool thread held per request
+#   async - main.py: AsyncOpenAI over a pooled httpx client, cancellable
+#
+# fake_gemini and each API run under uvicorn in their own processes; a fresh
+# fake-embedder index is built in a temp dir first. Every query is distinct
+# and the answer cache and BM25 fast path are disabled, so each request makes
+# both upstream calls.
+import os
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from openai import OpenAI
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FAKE_PORT = 5056
+API_PORT = 5057
+
+
+# -----------------------------
+# The old synchronous route, served as load_test:sync_app
+# -----------------------------
+def _sync_app():
+    from main import (QueryRequest, build_prompt, embedding_cache, format_sources,
+                      lexical_search, retrieve, store)
+
+    app = FastAPI(title="Fashion RAG API (sync client)")
+    client = OpenAI(api_key=os.getenv("GEMINI_API_KEY"), base_url=os.getenv("GEMINI_BASE_URL"), max_retries=1)
+
+    @app.on_event("startup")
+    def startup_event():
+        store.load()
+
+    @app.post("/api/rag/query")
+    def rag_query(data: QueryRequest):
+        try:
+            query_vector = embedding_cache.get_or_embed(
+                data.query, lambda q: client.embeddings.create(model="gemini-embedding-001", input=[q]).data[0].embedding)
+            snapshot, lexical_hits, _ = lexical_search(data.query)
+            docs, metas = retrieve(snapshot, query_vector, lexical_hits)
+            completion = client.chat.completions.create(
+                model="gemini-2.5-flash",
+                messages=[{"role": "user", "content": build_prompt(data.query, docs, metas)}],
+                max_tokens=512
+            )
+            return {"response": completion.choices[0].message.content, "sources": format_sources(metas)}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"RAG query failed: {str(e)}")
+
+    return app
+
+
+if os.getenv("RAG_LOAD_TEST_SYNC_APP"):
+    sync_app = _sync_app()
+
+
+# -----------------------------
+# Harness
+# -----------------------------
+def _serve(app, port, env):
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL)
+
+
+def _wait_ready(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def _fire(url, queries, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        async def one(query):
+            nonlocal failures
+            async with limit:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json={"query": query})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(q) for q in queries))
+        elapsed = time.perf_counter() - started
+    return elapsed, sorted(latencies), failures
+
+
+def _percentile(times, q):
+    return times[min(len(times) - 1, int(len(times) * q))] * 1000 if times else float("nan")
+
+
+def run(concurrency=200, queries=1000, chat_ms=500, embed_ms=50):
+    index_dir = tempfile.mkdtemp(prefix="rag_load_")
+    env = {**os.environ,
+           "RAG_INDEX_DIR": index_dir,
+           "GEMINI_API_KEY": "load-test",
+           "GEMINI_BASE_URL": f"http://127.0.0.1:{FAKE_PORT}/v1beta/openai/",
+           "FAKE_GEMINI_CHAT_MS": str(chat_ms),
+           "FAKE_GEMINI_EMBED_MS": str(embed_ms),
+           "RAG_ANSWER_CACHE_THRESHOLD": "2",  # never reuse an answer
+           "RAG_LEXICAL_FAST_PATH": "0",       # always embed
+           "RAG_MAX_CONNECTIONS": str(max(concurrency, 100)),
+           "RAG_MAX_INFLIGHT_EMBED": str(concurrency),
+           "RAG_MAX_INFLIGHT_CHAT": str(concurrency)}
+    subprocess.run([sys.executable, "ingest.py"], cwd=HERE, check=True, stdout=subprocess.DEVNULL,
+                   env={**env, "RAG_EMBEDDER": "fake"})
+
+    fake = _serve("fake_gemini:app", FAKE_PORT, env)
+    try:
+        _wait_ready(f"http://127.0.0.1:{FAKE_PORT}/stats")
+        print(f"{queries} distinct queries, {concurrency} in flight, fake upstream "
+              f"embed {embed_ms:.0f} ms + chat {chat_ms:.0f} ms, {os.cpu_count()} CPUs")
+        # fake_gemini, the API and this client share the CPUs: on a small host
+        # the stub's own CPU time caps both paths well below this
+        print(f"  (upstream-latency ceiling: {concurrency / ((embed_ms + chat_ms) / 1000):.0f} q/s)")
+        for label, app, extra in (("sync client", "load_test:sync_app", {"RAG_LOAD_TEST_SYNC_APP": "1"}),
+                                  ("async client", "main:app", {})):
+            api = _serve(app, API_PORT, {**env, **extra})
+            try:
+                _wait_ready(f"http://127.0.0.1:{API_PORT}/docs")
+                url = f"http://127.0.0.1:{API_PORT}/api/rag/query"
+                asyncio.run(_fire(url, [f"warm-up question {i} about denim" for i in range(10)], 10))
+                batch = [f"question {i}: which colours and fabrics trend for look {i}?" for i in range(queries)]
+                elapsed, latencies, failures = asyncio.run(_fire(url, batch, concurrency))
+            finally:
+                api.terminate()
+                api.wait()
+            print(f"  {label:<13} {len(latencies) / elapsed:7.1f} q/s   p50 {_percentile(latencies, 0.5):7.0f} ms"
+                  f"   p99 {_percentile(latencies, 0.99):7.0f} ms   failed {failures}")
+    finally:
+        fake.terminate()
+        fake.wait()
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG query load test: sync vs. async client path")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--chat-ms", type=float, default=500)
+    parser.add_argument("--embed-ms", type=float, default=50)
+    args = parser.parse_args()
+    run(args.concurrency, args.queries, args.chat_ms, args.embed_ms)
@@ -1,10 +1,21 @@
 # main.py
 import os
+import json
+import asyncio
+from typing import Annotated
+import httpx
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from openai import OpenAI
-from chromadb import Client
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, StringConstraints
+from openai import AsyncOpenAI, APITimeoutError
+
+from embeddings import GEMINI_BASE_URL, get_embedder
+from bm25 import LEXICAL_FAST_PATH, reciprocal_rank_fusion
+from index_store import IndexStore
+from retrievers import build_retriever
+from rag_cache import caches_from_env, normalize_query
 
 # -----------------------------
 # Load environment variables
@@ -15,71 +26,381 @@ if not API_KEY:
     raise ValueError("Please set GEMINI_API_KEY in your .env file")
 
 # -----------------------------
-# Initialize Gemini client
+# Initialize Gemini client (async, pooled keep-alive connections)
 # -----------------------------
-client = OpenAI(
+UPSTREAM_TIMEOUT = float(os.getenv("RAG_UPSTREAM_TIMEOUT", 30))
+REQUEST_TIMEOUT = float(os.getenv("RAG_REQUEST_TIMEOUT", 60))
+MAX_CONNECTIONS = int(os.getenv("RAG_MAX_CONNECTIONS", 100))
+
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+    timeout=httpx.Timeout(UPSTREAM_TIMEOUT, connect=5.0),
+)
+client = AsyncOpenAI(
     api_key=API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
+    base_url=GEMINI_BASE_URL,
+    http_client=http_client,
+    max_retries=1
 )
+embedder = get_embedder(async_client=client)
+
+# Concurrency limit per upstream, so a burst queues here instead of
+# tripping Gemini rate limits
+embed_limit = asyncio.Semaphore(int(os.getenv("RAG_MAX_INFLIGHT_EMBED", 64)))
+chat_limit = asyncio.Semaphore(int(os.getenv("RAG_MAX_INFLIGHT_CHAT", 64)))
 
 # -----------------------------
-# Initialize Chroma client
+# Open the persistent index written by ingest.py (RAG_INDEX_DIR)
 # -----------------------------
-chroma = Client()  # uses local DuckDB+Parquet by default
-collection = chroma.get_or_create_collection("market_trends")
+# Each loaded snapshot carries its own retriever (RAG_RETRIEVER); requests take
+# store.snapshot once and use it throughout, so a reload never mixes versions
+store = IndexStore(retriever_factory=build_retriever)
+collection = store.collection
 
 # -----------------------------
 # FastAPI app
 # -----------------------------
 app = FastAPI(title="Fashion RAG API")
 
+TOP_K = int(os.getenv("RAG_TOP_K", 4))
+# How many hits each of BM25 and the vector search contribute to the fusion
+FUSION_CANDIDATES = int(os.getenv("RAG_FUSION_CANDIDATES", max(TOP_K * 5, 20)))
+retrieval_stats = {"lexical": 0, "hybrid": 0}
+
+# /api/rag/query/batch: max queries per request, and answers generated at once per batch
+BATCH_MAX_QUERIES = int(os.getenv("RAG_BATCH_MAX_QUERIES", 256))
+BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", 16))
+BATCH_TIMEOUT = float(os.getenv("RAG_BATCH_TIMEOUT", 300))
+
+# Query embedding (exact match) and answer (semantic match) caches
+embedding_cache, answer_cache = caches_from_env()
+
+# Surrounding whitespace is stripped; an empty or blank query is a 422
+QueryText = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
 class QueryRequest(BaseModel):
-    query: str
+    query: QueryText
+    context_type: str | None = "market_trends"
+
+class BatchQueryRequest(BaseModel):
+    queries: list[QueryText]
     context_type: str | None = "market_trends"
 
 # -----------------------------
-# Load documents on startup
+# Load the index on startup (no re-embedding)
 # -----------------------------
 @app.on_event("startup")
 def startup_event():
-    # No-op if you already indexed documents with ingest.py
-    # Or you can add logic here to re-load if needed
-    print("RAG backend ready. Documents assumed indexed in Chroma.")
+    if store.load():
+        info = store.readiness()
+        print(f"RAG backend ready: index {info['version']}, {info['chunks']} chunks "
+              f"loaded in {info['load_seconds']}s from {store.index_dir} ({info['retriever']} retriever)")
+    else:
+        print(f"RAG backend started without an index in {store.index_dir}; run ingest.py")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await http_client.aclose()
 
 # -----------------------------
-# RAG query endpoint
+# Context helpers
 # -----------------------------
-@app.post("/api/rag/query")
-def rag_query(data: QueryRequest):
+def format_context(docs, metas):
+    if not docs:
+        return "No relevant context found."
+    return "\n\n".join(
+        f"[{(meta or {}).get('filename', 'unknown')}]\n{doc}" for doc, meta in zip(docs, metas)
+    )
+
+def format_sources(metas):
+    return [
+        {"filename": m.get("filename"), "start": m.get("start"), "end": m.get("end")}
+        for m in metas if m
+    ]
+
+def current_snapshot():
+    # Cached answers are only reused against the index they were built from
+    # (snapshot.version)
+    store.reload_if_changed()
+    return store.snapshot
+
+async def embed_query(query):
+    async def aembed(q):
+        async with embed_limit:
+            return (await embedder.aembed([q]))[0]
+    return await embedding_cache.aget_or_embed(query, aembed)
+
+async def embed_queries(queries):
+    """Embed many queries with one batched upstream call (cache misses only)."""
+    vectors, missing = {}, {}
+    for query in queries:
+        key = normalize_query(query)
+        if key not in vectors:
+            vectors[key] = embedding_cache.get(query)
+            if vectors[key] is None:
+                missing[key] = query
+    if missing:
+        async with embed_limit:
+            embedded = await embedder.aembed(list(missing.values()))
+        for (key, query), vector in zip(missing.items(), embedded):
+            embedding_cache.put(query, vector)
+            vectors[key] = vector
+    return [vectors[normalize_query(q)] for q in queries]
+
+def lexical_search(query):
+    """Refresh the index if needed and run BM25: (snapshot, hits, confident)."""
+    snapshot, [(hits, confident)] = lexical_search_many([query])
+    return snapshot, hits, confident
+
+def lexical_search_many(queries):
+    snapshot = current_snapshot()
+    if snapshot.bm25 is None:
+        return snapshot, [([], False) for _ in queries]
+    results = []
+    for query in queries:
+        hits = snapshot.bm25.search(query, FUSION_CANDIDATES)
+        results.append((hits, LEXICAL_FAST_PATH and snapshot.bm25.confident(query, hits)))
+    return snapshot, results
+
+def retrieve(snapshot, query_vector, lexical_hits):
+    """Blocking search; run it in the threadpool from async code.
+
+    With no query_vector (lexical fast path) the BM25 ranking is used as is,
+    otherwise it is merged with the vector ranking by reciprocal-rank fusion."""
+    return retrieve_many(snapshot, [query_vector], [lexical_hits])[0]
+
+def retrieve_many(snapshot, query_vectors, lexical_hits):
+    """retrieve() for a batch: one multi-vector search for every query that has a vector."""
+    with_vectors = [i for i, v in enumerate(query_vectors) if v is not None]
+    vector_hits = dict(zip(with_vectors, snapshot.retriever.search(
+        [query_vectors[i] for i in with_vectors], FUSION_CANDIDATES))) if with_vectors else {}
+    results = []
+    for i, lexical in enumerate(lexical_hits):
+        if i in vector_hits:
+            hits = reciprocal_rank_fusion([vector_hits[i], lexical], TOP_K)
+        else:
+            hits = lexical[:TOP_K]
+        results.append(([snapshot.documents[row] for row, _ in hits], [snapshot.metadatas[row] for row, _ in hits]))
+    return results
+
+def build_prompt(query, docs, metas):
+    context = format_context(docs, metas)
+    return f"""You are a Fashion Trends Analyst. Use this context to answer the question.\n\nContext:\n{context}\n\nQuestion: {query}"""
+
+async def run_until_disconnect(request, coro, poll_interval=0.25, timeout=REQUEST_TIMEOUT):
+    """Await coro, cancelling it if the client hangs up or the request times out."""
+    task = asyncio.ensure_future(coro)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
     try:
-        # 1. Embed the user query
-        emb_resp = client.embeddings.create(
-            model="gemini-embedding-001",
-            input=data.query
-        )
-        query_vector = emb_resp.data[0].embedding
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise HTTPException(status_code=499, detail="Client closed request")
+            if loop.time() > deadline:
+                raise HTTPException(status_code=504, detail="RAG query timed out")
+    finally:
+        task.cancel()
 
-        # 2. Retrieve top 3 relevant documents from Chroma
-        results = collection.query(
-            query_embeddings=[query_vector],
-            n_results=3,
-            include=["documents", "metadatas"]
-        )
+async def answer_query(query):
+    # 1. BM25 first: a confident keyword match skips the embedding call
+    snapshot, lexical_hits, confident = await run_in_threadpool(lexical_search, query)
+    version = snapshot.version
+    query_vector = None
+    if confident:
+        retrieval_stats["lexical"] += 1
+    else:
+        retrieval_stats["hybrid"] += 1
+        # Embed the user query (cached by normalized text)
+        query_vector = await embed_query(query)
 
-        docs = results["documents"][0] if results["documents"] else []
-        context = "\n\n".join(docs) if docs else "No relevant context found."
+        # Near-identical question already answered against this index?
+        cached = answer_cache.get(query_vector, version)
+        if cached is not None:
+            return {**cached, "cached": True}
 
-        # 3. Generate answer using Gemini
-        prompt = f"""You are a Fashion Trends Analyst. Use this context to answer the question.\n\nContext:\n{context}\n\nQuestion: {data.query}"""
+    # 2. Retrieve the most relevant passages (chunks): BM25 alone, or fused with vectors
+    docs, metas = await run_in_threadpool(retrieve, snapshot, query_vector, lexical_hits)
 
-        completion = client.chat.completions.create(
+    # 3. Generate answer using Gemini
+    return await generate_answer(query, docs, metas, query_vector, version)
+
+async def generate_answer(query, docs, metas, query_vector, version):
+    async with chat_limit:
+        completion = await client.chat.completions.create(
             model="gemini-2.5-flash",
-            messages=[{"role": "user", "content": prompt}],
+            messages=[{"role": "user", "content": build_prompt(query, docs, metas)}],
             max_tokens=512
         )
 
-        answer = completion.choices[0].message.content
-        return {"response": answer}
+    answer = completion.choices[0].message.content
+    result = {"response": answer, "sources": format_sources(metas)}
+    if query_vector is not None:
+        answer_cache.put(query_vector, version, result)
+    return result
 
+# -----------------------------
+# RAG query endpoint
+# -----------------------------
+@app.post("/api/rag/query")
+async def rag_query(data: QueryRequest, request: Request):
+    try:
+        return await run_until_disconnect(request, answer_query(data.query))
+    except HTTPException:
+        raise
+    except (APITimeoutError, httpx.TimeoutException):
+        raise HTTPException(status_code=504, detail="RAG query failed: upstream timeout")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"RAG query failed: {str(e)}")
+
+# -----------------------------
+# Batch endpoint (bulk/analytics workloads)
+# -----------------------------
+def error_detail(e):
+    if isinstance(e, (APITimeoutError, httpx.TimeoutException)):
+        return "RAG query failed: upstream timeout"
+    return f"RAG query failed: {str(e)}"
+
+async def answer_batch(queries):
+    """Answer many queries with one BM25 pass, one batched embedding call and
+    one multi-vector search; generation fans out BATCH_CONCURRENCY at a time.
+    Results keep the input order; a failed item carries "error" instead."""
+    results = [None] * len(queries)
+    snapshot, lexical = await run_in_threadpool(lexical_search_many, queries)
+    version = snapshot.version
+
+    query_vectors = [None] * len(queries)
+    need_vectors = [i for i, (_, confident) in enumerate(lexical) if not confident]
+    retrieval_stats["lexical"] += len(queries) - len(need_vectors)
+    retrieval_stats["hybrid"] += len(need_vectors)
+    if need_vectors:
+        try:
+            vectors = await embed_queries([queries[i] for i in need_vectors])
+        except Exception as e:
+            for i in need_vectors:
+                results[i] = {"error": error_detail(e)}
+            vectors = []
+        for i, vector in zip(need_vectors, vectors):
+            cached = answer_cache.get(vector, version)
+            if cached is not None:
+                results[i] = {**cached, "cached": True}
+            else:
+                query_vectors[i] = vector
+
+    pending = [i for i in range(len(queries)) if results[i] is None]
+    contexts = await run_in_threadpool(
+        retrieve_many, snapshot, [query_vectors[i] for i in pending], [lexical[i][0] for i in pending])
+
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def generate(i, docs, metas):
+        async with limit:
+            try:
+                results[i] = await generate_answer(queries[i], docs, metas, query_vectors[i], version)
+            except Exception as e:
+                results[i] = {"error": error_detail(e)}
+
+    await asyncio.gather(*(generate(i, docs, metas) for i, (docs, metas) in zip(pending, contexts)))
+    return {"results": [{"query": q, **r} for q, r in zip(queries, results)]}
+
+@app.post("/api/rag/query/batch")
+async def rag_query_batch(data: BatchQueryRequest, request: Request):
+    if not data.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(data.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+    try:
+        return await run_until_disconnect(request, answer_batch(data.queries), timeout=BATCH_TIMEOUT)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=error_detail(e))
+
+# -----------------------------
+# Streaming (Server-Sent Events) endpoint
+# -----------------------------
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sources_event(sources):
+    filenames = list(dict.fromkeys(s["filename"] for s in sources if s.get("filename")))
+    return sse("sources", {"filenames": filenames, "sources": sources})
+
+async def stream_answer(query):
+    """Yield SSE events: sources (as soon as retrieval is done), token*, done.
+
+    Starlette stops iterating when the client disconnects, which closes the
+    upstream completion stream as well."""
+    try:
+        snapshot, lexical_hits, confident = await run_in_threadpool(lexical_search, query)
+        version = snapshot.version
+        query_vector = None
+        if confident:
+            retrieval_stats["lexical"] += 1
+        else:
+            retrieval_stats["hybrid"] += 1
+            query_vector = await embed_query(query)
+            cached = answer_cache.get(query_vector, version)
+            if cached is not None:
+                yield sources_event(cached["sources"])
+                yield sse("token", {"text": cached["response"]})
+                yield sse("done", {"cached": True})
+                return
+
+        docs, metas = await run_in_threadpool(retrieve, snapshot, query_vector, lexical_hits)
+        sources = format_sources(metas)
+        yield sources_event(sources)
+
+        parts = []
+        async with chat_limit:
+            stream = await client.chat.completions.create(
+                model="gemini-2.5-flash",
+                messages=[{"role": "user", "content": build_prompt(query, docs, metas)}],
+                max_tokens=512,
+                stream=True
+            )
+            async with stream:
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield sse("token", {"text": delta})
+
+        if query_vector is not None:
+            answer_cache.put(query_vector, version, {"response": "".join(parts), "sources": sources})
+        yield sse("done", {"cached": False})
+    except (APITimeoutError, httpx.TimeoutException):
+        yield sse("error", {"detail": "RAG query failed: upstream timeout"})
+    except Exception as e:
+        yield sse("error", {"detail": f"RAG query failed: {str(e)}"})
+
+@app.post("/api/rag/query/stream")
+async def rag_query_stream(data: QueryRequest):
+    return StreamingResponse(
+        stream_answer(data.query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# -----------------------------
+# Cache and retrieval metrics
+# -----------------------------
+@app.get("/api/rag/stats")
+def rag_stats():
+    return {
+        "embedding_cache": embedding_cache.snapshot(),
+        "answer_cache": answer_cache.snapshot(),
+        "retrieval": retrieval_stats,
+    }
+
+# -----------------------------
+# Readiness
+# -----------------------------
+@app.get("/api/rag/ready")
+def rag_ready():
+    info = store.readiness()
+    if not info["ready"]:
+        raise HTTPException(status_code=503, detail=info)
+    return info
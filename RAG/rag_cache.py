@@ -0,0 +1,189 @@
+# rag_cache.py
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(text):
+    """Case/whitespace/punctuation-insensitive key: 'Top colors 2025?' == 'top  colors 2025'."""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.strip(" ?!.,;:")
+
+
+class _Stats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def snapshot(self, size, capacity):
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "capacity": capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+# -----------------------------
+# Level 1: exact-match query -> embedding
+# -----------------------------
+class EmbeddingCache:
+    def __init__(self, max_entries=2048, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (vector, created)
+        self._lock = threading.Lock()
+        self.stats = _Stats()
+
+    def get(self, query):
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+            self.stats.misses += 1
+            return None
+
+    def put(self, query, vector):
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = (vector, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def get_or_embed(self, query, embed):
+        vector = self.get(query)
+        if vector is None:
+            vector = embed(query)
+            self.put(query, vector)
+        return vector
+
+    async def aget_or_embed(self, query, aembed):
+        vector = self.get(query)
+        if vector is None:
+            vector = await aembed(query)
+            self.put(query, vector)
+        return vector
+
+    def snapshot(self):
+        with self._lock:
+            return self.stats.snapshot(len(self._entries), self.max_entries)
+
+
+# -----------------------------
+# Level 2: semantically similar query -> answer
+# -----------------------------
+class SemanticAnswerCache:
+    """Reuses an answer when a new query embedding is within `threshold`
+    cosine similarity of a cached one built against the same index version.
+
+    Vectors live in one preallocated (max_entries, dim) buffer: a put writes
+    its row in place, into a slot freed by expiry or LRU eviction, so the
+    matrix is never copied under the lock."""
+
+    def __init__(self, threshold=0.95, max_entries=1024, ttl=3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vectors = None       # (max_entries, dim) float32 unit rows, allocated on the first put
+        self._live = None          # (max_entries,) bool, rows holding an entry
+        self._entries = []         # per used row: dict(value, version, created, used), None when free
+        self._free = []            # freed rows, reused before the buffer grows into new ones
+        self._size = 0
+        self.stats = _Stats()
+
+    @staticmethod
+    def _unit(vector):
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def get(self, vector, index_version):
+        q = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            self._expire(now, index_version)
+            if not self._size or self._vectors.shape[1] != q.shape[0]:
+                self.stats.misses += 1
+                return None
+            rows = len(self._entries)
+            sims = self._vectors[:rows] @ q
+            sims[~self._live[:rows]] = -np.inf
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.stats.misses += 1
+                return None
+            entry = self._entries[best]
+            entry["used"] = now
+            self.stats.hits += 1
+            return entry["value"]
+
+    def put(self, vector, index_version, value):
+        q = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != q.shape[0]:
+                self._vectors = np.empty((self.max_entries, q.shape[0]), dtype=np.float32)
+                self._live = np.zeros(self.max_entries, dtype=bool)
+                self._entries, self._free, self._size = [], [], 0
+            if not self._free and len(self._entries) >= self.max_entries:
+                # evict least recently used
+                victim = min(range(len(self._entries)), key=lambda i: self._entries[i]["used"])
+                self._drop([victim])
+                self.stats.evictions += 1
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self._entries)
+                self._entries.append(None)
+            self._vectors[row] = q
+            self._live[row] = True
+            self._entries[row] = {"value": value, "version": index_version, "created": now, "used": now}
+            self._size += 1
+
+    def _expire(self, now, index_version):
+        dead = [i for i, e in enumerate(self._entries)
+                if e is not None and (e["version"] != index_version or now - e["created"] >= self.ttl)]
+        if dead:
+            self._drop(dead)
+            self.stats.evictions += len(dead)
+
+    def _drop(self, rows):
+        for row in rows:
+            self._entries[row] = None
+            self._live[row] = False
+            self._free.append(row)
+        self._size -= len(rows)
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats.snapshot(self._size, self.max_entries), "threshold": self.threshold}
+
+
+def caches_from_env():
+    return (
+        EmbeddingCache(
+            max_entries=int(os.getenv("RAG_EMBED_CACHE_SIZE", 2048)),
+            ttl=float(os.getenv("RAG_EMBED_CACHE_TTL", 24 * 3600)),
+        ),
+        SemanticAnswerCache(
+            threshold=float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", 0.95)),
+            max_entries=int(os.getenv("RAG_ANSWER_CACHE_SIZE", 1024)),
+            ttl=float(os.getenv("RAG_ANSWER_CACHE_TTL", 3600)),
+        ),
+    )
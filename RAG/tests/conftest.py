@@ -0,0 +1,12 @@
+# RAG modules import each other flat (`from index_store import ...`), as when
+# the API is started from RAG/. Importing ingest.py builds its embedder and
+# store at module level, and main.py wants an API key: use the offline embedder,
+# a throwaway index dir and a dummy key (the tests make no upstream calls).
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["RAG_EMBEDDER"] = "fake"
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("RAG_INDEX_DIR", tempfile.mkdtemp(prefix="rag_test_index_"))
@@ -0,0 +1,66 @@
+import pytest
+
+import ingest
+from embeddings import FakeEmbedder
+from index_store import IndexStore
+
+TRENDS = ("Wide-leg denim is back for spring. Designers pair it with cropped jackets.\n\n"
+          "Earth tones dominate the autumn collections, with rust and olive leading.")
+FABRICS = "Recycled polyester and organic cotton now make up most new capsule lines."
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    docs = tmp_path / "documents"
+    docs.mkdir()
+    (docs / "trends.txt").write_text(TRENDS, encoding="utf-8")
+    (docs / "fabrics.txt").write_text(FABRICS, encoding="utf-8")
+
+    store = IndexStore(str(tmp_path / "index"))
+    embedder = FakeEmbedder()
+    monkeypatch.setattr(ingest, "store", store)
+    monkeypatch.setattr(ingest, "collection", store.collection)
+    monkeypatch.setattr(ingest, "embedder", embedder)
+    return docs, store, embedder
+
+
+def test_rerun_embeds_nothing(index):
+    docs, store, embedder = index
+
+    first = ingest.load_and_index(str(docs))
+    assert first["added"] > 0 and first["unchanged"] == 0
+    assert embedder.texts_embedded == first["added"]
+    store.load()
+    version = store.version
+
+    second = ingest.load_and_index(str(docs))
+    assert second == {"added": 0, "removed": 0, "unchanged": first["added"]}
+    assert embedder.texts_embedded == first["added"]  # no embedding calls at all
+    store.reload_if_changed()
+    assert store.version == version
+
+
+def test_edit_reembeds_only_changed_chunks(index):
+    docs, store, embedder = index
+    first = ingest.load_and_index(str(docs))
+    embedded = embedder.texts_embedded
+
+    (docs / "fabrics.txt").write_text(FABRICS + " Deadstock silk is the luxury pick.", encoding="utf-8")
+    second = ingest.load_and_index(str(docs))
+
+    assert second["added"] == second["removed"] == 1
+    assert second["unchanged"] == first["added"] - 1
+    assert embedder.texts_embedded == embedded + 1
+
+
+def test_removed_file_drops_its_chunks(index):
+    docs, store, embedder = index
+    ingest.load_and_index(str(docs))
+
+    (docs / "fabrics.txt").unlink()
+    result = ingest.load_and_index(str(docs))
+
+    assert result["added"] == 0 and result["removed"] >= 1
+    assert store.load()
+    assert {m["filename"] for m in store.snapshot.metadatas} == {"trends.txt"}
+    assert store.snapshot.manifest["chunks"] == store.collection.count()
@@ -0,0 +1,25 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("query", ["", "   ", "\n\t"])
+def test_blank_query_is_422(client, query):
+    assert client.post("/api/rag/query", json={"query": query}).status_code == 422
+    assert client.post("/api/rag/query/stream", json={"query": query}).status_code == 422
+
+
+def test_blank_batch_item_is_422(client):
+    response = client.post("/api/rag/query/batch", json={"queries": ["denim trends", "  "]})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "queries", 1]
+
+
+def test_query_is_stripped():
+    assert main.QueryRequest(query="  denim trends \n").query == "denim trends"
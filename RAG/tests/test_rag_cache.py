@@ -0,0 +1,38 @@
+import numpy as np
+
+from rag_cache import SemanticAnswerCache
+
+
+def _vector(i, dim=8):
+    v = np.zeros(dim, dtype=np.float32)
+    v[i] = 1.0
+    return v
+
+
+def test_answers_reuse_rows_of_one_buffer():
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=3)
+    for i in range(3):
+        cache.put(_vector(i), "v1", f"answer {i}")
+    buffer = cache._vectors
+    assert cache.get(_vector(0), "v1") == "answer 0"
+
+    # full: the least recently used row (answer 1) is overwritten in place
+    cache.put(_vector(3), "v1", "answer 3")
+
+    assert cache._vectors is buffer
+    assert cache.get(_vector(1), "v1") is None
+    assert [cache.get(_vector(i), "v1") for i in (0, 2, 3)] == ["answer 0", "answer 2", "answer 3"]
+    assert cache.snapshot()["size"] == 3 and cache.snapshot()["evictions"] == 1
+
+
+def test_new_index_version_frees_every_row():
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=4)
+    cache.put(_vector(0), "v1", "old")
+    cache.put(_vector(1), "v1", "old")
+
+    assert cache.get(_vector(0), "v2") is None
+    assert cache.snapshot()["size"] == 0
+
+    cache.put(_vector(2), "v2", "new")
+    assert cache.get(_vector(2), "v2") == "new" and cache.get(_vector(0), "v2") is None
+    assert len(cache._entries) == 2  # the new answer took a freed row
@@ -0,0 +1,171 @@
+# backend/auth_tokens.py
+# JWT verification once per token, plus the Flask hook that applies it.
+#
+# Clients send the same token on every request for days, so re-running
+# jwt.decode (base64 + JSON + HMAC) each time is wasted work. TokenCache keeps
+# verified claims in a bounded LRU keyed by the token string until the
+# token's `exp`; a repeat request costs a dict lookup and a clock read.
+# Only tokens that verified are cached, and an entry is never served past
+# `exp`.
+#
+# init_auth(app, cache) installs a before_request hook that reads the
+# x-auth-token header and sets g.user_id (None when missing or invalid);
+# @login_required answers 401 for routes that need a user.
+#
+#   python auth_tokens.py    # per-request auth cost, jwt.decode vs. cache
+import os
+import time
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+import jwt
+from flask import g, jsonify, request
+
+AUTH_HEADER = "x-auth-token"
+
+
+class TokenCache:
+    def __init__(self, secret, algorithms=("HS256",), max_entries=10_000):
+        self.secret = secret
+        self.algorithms = list(algorithms)
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # token -> (claims, exp), least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.expired = 0
+
+    def verify(self, token):
+        """Verified claims for `token`, or None if it is invalid or expired."""
+        if not token:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                if now < entry[1]:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[token]
+                self.expired += 1
+
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=self.algorithms)
+        except jwt.InvalidTokenError:
+            with self._lock:
+                self.rejected += 1
+            return None
+
+        with self._lock:
+            self.misses += 1
+            # tokens without exp are still verified per request, never cached
+            if "exp" in claims:
+                self._entries[token] = (claims, claims["exp"])
+                self._entries.move_to_end(token)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return claims
+
+    def user_id(self, token):
+        claims = self.verify(token)
+        return claims.get("user_id") if claims else None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def cache_from_env(secret):
+    return TokenCache(secret, max_entries=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10_000)))
+
+
+def init_auth(app, cache, header=AUTH_HEADER):
+    """Set g.user_id from the auth header before every request."""
+    @app.before_request
+    def _authenticate():
+        g.user_id = cache.user_id(request.headers.get(header))
+
+
+def login_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not g.get("user_id"):
+            return jsonify({"message": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# ===================== #
+#   AUTH MICROBENCH     #
+# ===================== #
+def benchmark(requests=50_000):
+    import datetime
+    from flask import Flask
+
+    secret = "benchmark-secret-" + "x" * 32
+    token = jwt.encode({"user_id": "6512bd43d9caa6e02c990b0a",
+                        "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=3)},
+                       secret, algorithm="HS256")
+
+    t = time.perf_counter()
+    for _ in range(requests):
+        jwt.decode(token, secret, algorithms=["HS256"])["user_id"]
+    decode_us = (time.perf_counter() - t) * 1e6 / requests
+
+    cache = TokenCache(secret)
+    cache.user_id(token)
+    t = time.perf_counter()
+    for _ in range(requests):
+        cache.user_id(token)
+    cached_us = (time.perf_counter() - t) * 1e6 / requests
+    print(f"auth per request, {requests:,} requests with one token")
+    print(f"  jwt.decode (HS256):  {decode_us:6.2f} us")
+    print(f"  TokenCache hit:      {cached_us:6.2f} us   ({decode_us / cached_us:.0f}x)")
+
+    # the same through a Flask request cycle, hook + decorator included
+    def per_request(app):
+        client = app.test_client()
+        n = requests // 10
+        client.get("/me", headers={AUTH_HEADER: token})
+        t = time.perf_counter()
+        for _ in range(n):
+            client.get("/me", headers={AUTH_HEADER: token})
+        return (time.perf_counter() - t) * 1e6 / n
+
+    before = Flask("before")
+
+    @before.route("/me")
+    def me_before():
+        try:
+            user_id = jwt.decode(request.headers.get(AUTH_HEADER), secret, algorithms=["HS256"])["user_id"]
+        except jwt.InvalidTokenError:
+            return jsonify({"message": "Unauthorized"}), 401
+        return jsonify({"user_id": user_id})
+
+    after = Flask("after")
+    init_auth(after, TokenCache(secret))
+
+    @after.route("/me")
+    @login_required
+    def me_after():
+        return jsonify({"user_id": g.user_id})
+
+    print(f"  full Flask request, decode in route:  {per_request(before):7.1f} us")
+    print(f"  full Flask request, cached middleware: {per_request(after):6.1f} us")
+
+
+if __name__ == "__main__":
+    benchmark()
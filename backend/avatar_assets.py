@@ -0,0 +1,142 @@
+# backend/avatar_assets.py
+# In-memory registry of the avatar images sent to D-ID /talks.
+#
+# Every image in the avatar directory (public/avatar) is registered under its
+# file stem ("avatar1.png" -> "avatar1"), read once, downscaled to at most
+# `max_dim` and re-encoded as JPEG (alpha flattened onto white), then kept as
+# a ready-made data: URL, so /speak does no disk I/O or base64 work. Other
+# sizes are built on first use and cached too.
+#
+# Nothing is read until the first lookup (or load(), e.g. from a startup
+# pre-warm), so constructing the registry is free. After that the directory
+# is re-scanned at most every `reload_interval` seconds on access; added,
+# changed (mtime/size) or removed files are picked up without a restart.
+import io
+import os
+import time
+import base64
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+class AvatarRegistry:
+    def __init__(self, directory, max_dim=1024, quality=90, reload_interval=5.0):
+        self.directory = directory
+        self.max_dim = max_dim
+        self.quality = quality
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._files = {}     # avatar_id -> (path, mtime, size)
+        self._variants = {}  # (avatar_id, max_dim) -> {"data_url", "bytes", "size"}
+        self._checked = None
+        self.reloads = 0
+        self.encodes = 0
+
+    def _scan(self):
+        files = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            if ext.lower() not in IMAGE_EXTENSIONS or not entry.is_file():
+                continue
+            st = entry.stat()
+            files[stem] = (entry.path, st.st_mtime, st.st_size)
+
+        changed = {aid for aid in files.keys() | self._files.keys() if files.get(aid) != self._files.get(aid)}
+        if changed and self._files:
+            self.reloads += 1
+            log.info("avatar images changed: %s", ", ".join(sorted(changed)))
+        self._files = files
+        self._variants = {key: v for key, v in self._variants.items() if key[0] not in changed}
+        self._checked = time.monotonic()
+
+        # pre-encode the default size so the first /speak is as fast as the rest
+        for avatar_id in sorted(changed & files.keys()):
+            try:
+                self._variant(avatar_id, self.max_dim)
+            except Exception as e:
+                log.warning("could not load avatar %s: %s", avatar_id, e)
+
+    def _encode(self, path, max_dim):
+        from PIL import Image
+
+        img = Image.open(path)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        else:
+            img = img.convert("RGB")
+        if max_dim and max(img.size) > max_dim:
+            img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=self.quality, optimize=True)
+        return buf.getvalue(), img.size
+
+    def _variant(self, avatar_id, max_dim):
+        """Caller holds self._lock."""
+        key = (avatar_id, max_dim)
+        variant = self._variants.get(key)
+        if variant is None:
+            data, size = self._encode(self._files[avatar_id][0], max_dim)
+            variant = {
+                "data_url": "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii"),
+                "bytes": len(data),
+                "size": size,
+            }
+            self._variants[key] = variant
+            self.encodes += 1
+        return variant
+
+    def _refresh(self):
+        """Caller holds self._lock."""
+        if self._checked is None or time.monotonic() - self._checked >= self.reload_interval:
+            self._scan()
+
+    def load(self):
+        """Scan and pre-encode now instead of on the first lookup."""
+        with self._lock:
+            self._refresh()
+
+    def get(self, avatar_id, max_dim=None):
+        """Encoded avatar ({"data_url", "bytes", "size"}), or None if unknown."""
+        with self._lock:
+            self._refresh()
+            if avatar_id not in self._files:
+                return None
+            return self._variant(avatar_id, max_dim or self.max_dim)
+
+    def ids(self):
+        with self._lock:
+            self._refresh()
+            return sorted(self._files)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "loaded": self._checked is not None,
+                "avatars": len(self._files),
+                "variants": len(self._variants),
+                "cached_bytes": sum(v["bytes"] for v in self._variants.values()),
+                "encodes": self.encodes,
+                "reloads": self.reloads,
+            }
+
+
+def registry_from_env(default_dir):
+    return AvatarRegistry(
+        os.getenv("AVATAR_DIR", default_dir),
+        max_dim=int(os.getenv("AVATAR_MAX_DIM", 1024)),
+        quality=int(os.getenv("AVATAR_JPEG_QUALITY", 90)),
+        reload_interval=float(os.getenv("AVATAR_RELOAD_SECONDS", 5)),
+    )
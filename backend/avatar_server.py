@@ -1,63 +1,122 @@
-import io
 import os
+import time
 import base64
 import datetime
+from collections import namedtuple
+from startup import Lazy, StartupReport, features_from_env, prewarm, prewarm_from_env
+
+# per-subsystem boot timings, from here on (imports included); lazy loads are added as
+# they happen (/provider-stats "startup")
+startup = StartupReport()
+
+# Heavy stacks (pymongo/bson, Pillow, rembg, Vertex AI) are not imported here: they load
+# on first use, from the db_setup boot job or from the optional pre-warm, see startup.py
 import jwt
-import base64
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from flask_bcrypt import Bcrypt
-from pymongo import MongoClient
-from bson.objectid import ObjectId
 from dotenv import load_dotenv
-from PIL import Image
-from rembg import remove
-from google.cloud import aiplatform
-from gtts import gTTS
 from flask import send_file
-import tempfile
 from flask import send_from_directory
-import requests
 import json
+from provider_client import get_client, provider_stats
+from bg_removal import PoolSaturated, pool_from_env
+from cutout_cache import cache_from_env as cutout_cache_from_env
+from avatar_assets import registry_from_env
+from auth_tokens import cache_from_env as token_cache_from_env, init_auth, login_required
+from password_hashing import HasherBusy, hasher_from_env
+from pose_generation import PoseGenerator, load_image_model
+from image_io import (multipart_stream, new_boundary, open_image, option_flag, read_image_request,
+                      response_format, to_base64)
+from image_encoding import IMAGE_FORMATS, MIMETYPES, encode_options, encode_png_bytes
+from tts_cache import cache_from_env
+from tts_stream import audio_stream_response
+startup.record("imports", time.perf_counter() - startup.started)
 
 
 load_dotenv()
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}})
-bcrypt = Bcrypt(app)
-# Create videos directory
-VIDEOS_DIR = os.path.join(os.getcwd(), "generated_videos")
-AUDIO_DIR = os.path.join(os.getcwd(), "generated_audio")
-os.makedirs(VIDEOS_DIR, exist_ok=True)
-os.makedirs(AUDIO_DIR, exist_ok=True)
-
-@app.route("/videos/<filename>")
+# SERVER_FEATURES=auth,media,ai (default: all); e.g. "auth" boots only auth/profile/drafts
+FEATURES = features_from_env()
+with startup.phase("app"):
+    app = Flask(__name__)
+    CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}})
+
+def feature_route(feature, rule, **options):
+    """app.route() for a route in a SERVER_FEATURES group; not registered when the group is off."""
+    def decorator(view):
+        return app.route(rule, **options)(view) if feature in FEATURES else view
+    return decorator
+
+with startup.phase("auth"):
+    # bcrypt runs on a bounded pool, never on the request thread (BCRYPT_ROUNDS, BCRYPT_WORKERS, BCRYPT_QUEUE_LIMIT)
+    password_hasher = hasher_from_env()
+    # Secret key for JWT
+    app.config['SECRET_KEY'] = os.getenv("JWT_SECRET", "supersecretkey")
+    # each token is decoded once, then served from an LRU until it expires; sets g.user_id (AUTH_TOKEN_CACHE_SIZE)
+    token_cache = token_cache_from_env(app.config["SECRET_KEY"])
+    init_auth(app, token_cache)
+
+# MongoDB (pool size / timeouts from MONGO_* env vars, see user_store.py): pymongo is imported
+# and the client built on first use; indexes and the legacy drafts migration run in the
+# background on every boot (db_setup below)
+Mongo = namedtuple("Mongo", "db users drafts")
+
+def connect_mongo():
+    from user_store import UserStore, mongo_client_from_env
+    from draft_store import DraftStore
+
+    client = mongo_client_from_env(os.getenv("ATLAS_URI"))
+    db = client["fashion_ai"]
+    # drafts live in their own collection, one document per draft (see draft_store.py)
+    return Mongo(db, UserStore(db["users"]), DraftStore(db["drafts"]))
+
+def setup_db():
+    from provision_db import provision
+    return provision(mongo.get().db)
+
+mongo = Lazy("mongo", connect_mongo, startup)
+
+tts_cache = did = DID_HEADERS = avatar_assets = None
+if "media" in FEATURES:
+    with startup.phase("media"):
+        # Create videos directory
+        VIDEOS_DIR = os.path.join(os.getcwd(), "generated_videos")
+        AUDIO_DIR = os.path.join(os.getcwd(), "generated_audio")
+        os.makedirs(VIDEOS_DIR, exist_ok=True)
+        os.makedirs(AUDIO_DIR, exist_ok=True)
+        tts_cache = cache_from_env(os.path.join(os.getcwd(), "tts_cache"))
+        D_ID_API_KEY = os.getenv("D_ID_API_KEY")
+        did = get_client("did")
+        # Basic auth for D-ID, built once
+        DID_HEADERS = {
+            "Authorization": f"Basic {base64.b64encode(f'{D_ID_API_KEY}:'.encode()).decode()}",
+            "Content-Type": "application/json"
+        }
+        # public/avatar images, encoded on first use and watched for changes (AVATAR_DIR, AVATAR_MAX_DIM)
+        avatar_assets = registry_from_env(
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "public", "avatar")
+        )
+
+rembg_pool = cutout_cache = pose_generator = None
+if "ai" in FEATURES:
+    with startup.phase("ai"):
+        # rembg runs in worker processes (REMBG_WORKERS, REMBG_QUEUE_LIMIT), never on the request thread;
+        # the workers start on first use
+        rembg_pool = pool_from_env()
+        # Cut-outs cached by image hash + model, so re-uploaded images skip rembg (CUTOUT_CACHE_*)
+        cutout_cache = cutout_cache_from_env(os.path.join(os.getcwd(), "cutout_cache"),
+                                             rembg_pool.remove, params=rembg_pool.model)
+        # Image model (and Vertex AI, GCP_PROJECT_ID / GCP_REGION) loaded on first use and shared;
+        # poses are generated concurrently (IMAGE_MODEL=fake for offline runs)
+        pose_generator = PoseGenerator(cutout_cache, load_model=startup.timed("image_model", load_image_model))
+
+@feature_route("media", "/videos/<filename>")
 def serve_video(filename):
     return send_from_directory(VIDEOS_DIR, filename)
 
-@app.route("/audio/<filename>")
+@feature_route("media", "/audio/<filename>")
 def serve_audio(filename):
     return send_from_directory(AUDIO_DIR, filename)
 
-
-# Secret key for JWT
-app.config['SECRET_KEY'] = os.getenv("JWT_SECRET", "supersecretkey")
-D_ID_API_KEY = os.getenv("D_ID_API_KEY")
-
-# MongoDB Setup
-mongo_uri = os.getenv("ATLAS_URI")
-client = MongoClient(mongo_uri)
-db = client["fashion_ai"]
-users = db["users"]
-
-# Google Vertex AI Setup
-GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
-GCP_REGION = os.getenv("GCP_REGION", "us-central1")
-if not GCP_PROJECT_ID:
-    raise ValueError("Missing GCP_PROJECT_ID in .env file.")
-
-aiplatform.init(project=GCP_PROJECT_ID, location=GCP_REGION)
-
 # ===================== #
 #  HELPER FUNCTIONS     #
 # ===================== #
@@ -69,33 +128,50 @@ def generate_token(user_id):
     token = jwt.encode(payload, app.config["SECRET_KEY"], algorithm="HS256")
     return token
 
-def verify_token(token):
-    try:
-        decoded = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
-        return decoded["user_id"]
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
-def image_to_base64(img: Image.Image):
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
+def busy_response(e: PoolSaturated):
+    return jsonify({"error": "Background removal is busy, please retry"}), 503, {"Retry-After": str(e.retry_after)}
+
+def auth_busy_response(e: HasherBusy):
+    return jsonify({"message": "Too many sign-in attempts right now, please retry"}), 503, {"Retry-After": str(e.retry_after)}
+
+def read_credentials():
+    """(email, password, None) from the JSON body, or (None, None, 400 response).
+
+    Both must be non-empty strings: anything else would reach bcrypt (500) or
+    the email lookup as an operator document."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None, None, (jsonify({"message": "Request body must be a JSON object"}), 400)
+    email, password = data.get("email"), data.get("password")
+    if (email is not None and not isinstance(email, str)) or (password is not None and not isinstance(password, str)):
+        return None, None, (jsonify({"message": "Email and password must be strings"}), 400)
+    if not email or not password:
+        return None, None, (jsonify({"message": "Email and password are required"}), 400)
+    return email, password, None
+
+def server_timing(**phases):
+    """Server-Timing header from phase durations in seconds."""
+    return {"Server-Timing": ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases.items())}
 
 # ===================== #
 #   AUTHENTICATION API  #
 # ===================== #
-@app.route("/api/auth/register", methods=["POST"])
+@feature_route("auth", "/api/auth/register", methods=["POST"])
 def register_user():
+    email, password, error = read_credentials()
+    if error:
+        return error
     data = request.get_json()
-    email = data.get("email")
-    password = data.get("password")
 
-    if users.find_one({"email": email}):
+    users = mongo.get().users
+    # cheap indexed check first so an existing email doesn't pay for a bcrypt hash
+    if users.exists(email):
         return jsonify({"message": "User already exists"}), 400
 
-    hashed_pw = bcrypt.generate_password_hash(password).decode("utf-8")
+    try:
+        hashed_pw, hash_seconds = password_hasher.hash(password)
+    except HasherBusy as e:
+        return auth_busy_response(e)
     new_user = {
         "name": data.get("name", ""),
         "email": email,
@@ -103,29 +179,53 @@ def register_user():
         "phone": "",
         "username": "",
         "socialLinks": {"tiktok": "", "facebook": "", "instagram": ""},
-        "privacy": {"twoFactorAuth": False, "dataSharing": False},
-        "drafts": []
+        "privacy": {"twoFactorAuth": False, "dataSharing": False}
     }
 
-    result = users.insert_one(new_user)
-    token = generate_token(result.inserted_id)
+    user_id = users.create(new_user)
+    if user_id is None:
+        # lost a race with a concurrent register for the same email
+        return jsonify({"message": "User already exists"}), 400
+    token = generate_token(user_id)
 
-    return jsonify({"message": "User registered", "token": token})
+    return jsonify({"message": "User registered", "token": token}), 200, server_timing(hash=hash_seconds)
 
-@app.route("/api/auth/login", methods=["POST"])
+@feature_route("auth", "/api/auth/login", methods=["POST"])
 def login_user():
-    data = request.get_json()
-    user = users.find_one({"email": data.get("email")})
-    if not user or not bcrypt.check_password_hash(user["password"], data.get("password")):
-        return jsonify({"message": "Invalid credentials"}), 401
+    email, password, error = read_credentials()
+    if error:
+        return error
+    users = mongo.get().users
+    started = time.perf_counter()
+    user = users.find_for_login(email)
+    db_seconds = time.perf_counter() - started
+    if not user:
+        return jsonify({"message": "Invalid credentials"}), 401, server_timing(db=db_seconds)
+
+    started = time.perf_counter()
+    try:
+        valid, hash_seconds = password_hasher.verify(password, user["password"])
+    except HasherBusy as e:
+        return auth_busy_response(e)
+    # hash = bcrypt itself, hash-wait = time queued for a hashing worker
+    timing = server_timing(db=db_seconds, hash=hash_seconds,
+                           **{"hash-wait": max(0.0, time.perf_counter() - started - hash_seconds)})
+    if not valid:
+        return jsonify({"message": "Invalid credentials"}), 401, timing
+
+    if password_hasher.needs_rehash(user["password"]):
+        # BCRYPT_ROUNDS changed: upgrade this hash in the background, only if it is still the one we checked
+        old_hash = user["password"]
+        password_hasher.rehash_later(
+            password, lambda new_hash: users.replace_password(user["_id"], old_hash, new_hash))
 
     token = generate_token(user["_id"])
-    return jsonify({"message": "Login successful", "token": token})
+    return jsonify({"message": "Login successful", "token": token}), 200, timing
 
 # ===================== #
 #   VOICE PREVIEW API   #
 # ===================== #
-@app.route("/preview-voice", methods=["POST"])
+@feature_route("media", "/preview-voice", methods=["POST"])
 def preview_voice():
     data = request.get_json()
     text = data.get("text")
@@ -135,21 +235,20 @@ def preview_voice():
         return jsonify({"error": "No text provided"}), 400
 
     try:
-        # Simple TTS using gTTS (Google Text-to-Speech)
+        # Simple TTS using gTTS (Google Text-to-Speech), cached by text + voice
         # You can extend this to map 'voice_code' to different TTS accents or engines
-        tts = gTTS(text=text, lang="en")  
+        # stream=true sends the audio sentence by sentence as it is synthesized
+        if data.get("stream") or request.args.get("stream") == "1":
+            return audio_stream_response(tts_cache, text, lang="en")
 
-        # Save to temporary file
-        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-        tts.save(tmp_file.name)
-
-        return send_file(tmp_file.name, mimetype="audio/mpeg")
+        audio_path = tts_cache.get(text, lang="en")
+        return send_file(audio_path, mimetype="audio/mpeg")
     except Exception as e:
         print("TTS error:", e)
         return jsonify({"error": f"Failed to generate voice preview: {str(e)}"}), 500
   # Add to your .env file
 
-@app.route("/speak", methods=["POST", "OPTIONS"])
+@feature_route("media", "/speak", methods=["POST", "OPTIONS"])
 def generate_avatar_video():
     if request.method == "OPTIONS":
         return jsonify({"status": "ok"}), 200
@@ -163,35 +262,15 @@ def generate_avatar_video():
         return jsonify({"success": False, "error": "Missing text or avatar"}), 400
 
     try:
-        # Map avatar_id to avatar image path
-        avatar_images = {
-            "avatar1": "/avatar/avatar1.jpg",
-            "avatar2": "/avatar/avatar2.jpg",
-            "avatar3": "/avatar/avatar3.jpg",
-            "avatar4": "/avatar/avatar4.jpg"
-        }
-
-        avatar_image_path = avatar_images.get(avatar_id)
-        if not avatar_image_path:
+        # avatar_id is the image's file stem in public/avatar (avatar1 ... avatar4)
+        avatar = avatar_assets.get(avatar_id)
+        if not avatar:
             return jsonify({"success": False, "error": "Invalid avatar"}), 400
 
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        avatar_full_path = os.path.join(base_dir, "public", avatar_image_path.lstrip("/"))
-
-        with open(avatar_full_path, "rb") as img_file:
-            avatar_b64 = base64.b64encode(img_file.read()).decode("utf-8")
-
-        # Prepare Base64 authorization for D-ID API
-        auth_header = base64.b64encode(f"{D_ID_API_KEY}:".encode()).decode()
-        headers = {
-            "Authorization": f"Basic {auth_header}",
-            "Content-Type": "application/json"
-        }
-
         # Call D-ID API
-        did_response = requests.post(
-            "https://api.d-id.com/talks",
-            headers=headers,
+        did_response = did.post(
+            "/talks",
+            headers=DID_HEADERS,
             json={
                 "script": {
                     "type": "text",
@@ -201,7 +280,7 @@ def generate_avatar_video():
                         "voice_id": "en-US-JennyNeural"
                     }
                 },
-                "source_url": f"data:image/jpeg;base64,{avatar_b64}",
+                "source_url": avatar["data_url"],
                 "config": {
                     "fluent": True,
                     "pad_audio": 0
@@ -220,12 +299,11 @@ def generate_avatar_video():
         # Poll for video completion
         video_url = None
         for _ in range(30):
-            import time
             time.sleep(2)
 
-            status_response = requests.get(
-                f"https://api.d-id.com/talks/{talk_id}",
-                headers=headers
+            status_response = did.get(
+                f"/talks/{talk_id}",
+                headers=DID_HEADERS
             )
             status_data = status_response.json()
             if status_data["status"] == "done":
@@ -247,29 +325,79 @@ def generate_avatar_video():
 # ===================== #
 #   PROFILE MANAGEMENT  #
 # ===================== #
-@app.route("/api/profile/update", methods=["PUT"])
+@feature_route("auth", "/api/profile/update", methods=["PUT"])
+@login_required
 def update_profile():
-    token = request.headers.get("x-auth-token")
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({"message": "Unauthorized"}), 401
-
+    user_id = g.user_id
     data = request.get_json()
     update_data = {}
 
     allowed_fields = [
         "name", "phone", "username",
-        "socialLinks", "privacy", "drafts"
+        "socialLinks", "privacy"
     ]
     for field in allowed_fields:
         if field in data:
             update_data[field] = data[field]
 
-    users.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
-    updated_user = users.find_one({"_id": ObjectId(user_id)}, {"password": 0})
-    updated_user["_id"] = str(updated_user["_id"])
+    # legacy clients still send the whole drafts array: it replaces the user's drafts
+    # (upserts the ones sent, deletes the ones left out)
+    if "drafts" in data:
+        drafts = mongo.get().drafts
+        try:
+            drafts.replace_all(user_id, data["drafts"] or [])
+        except drafts.Error as e:
+            return jsonify({"message": str(e)}), 400
+        if not update_data:
+            return jsonify({"message": "Profile updated", "user": {"_id": user_id}})
+    if not update_data:
+        return jsonify({"message": "No profile fields to update"}), 400
+
+    # one round trip: update and read back only the fields that changed
+    updated_user = mongo.get().users.update_profile(user_id, update_data)
+    if not updated_user:
+        return jsonify({"message": "User not found"}), 404
     return jsonify({"message": "Profile updated", "user": updated_user})
 
+# ===================== #
+#      DRAFTS API       #
+# ===================== #
+@feature_route("auth", "/api/profile/drafts", methods=["GET"])
+@login_required
+def list_drafts():
+    user_id = g.user_id
+    drafts = mongo.get().drafts
+    try:
+        page, next_cursor = drafts.list(user_id, request.args.get("limit"), request.args.get("cursor"))
+    except drafts.Error as e:
+        return jsonify({"message": str(e)}), 400
+    return jsonify({"drafts": page, "next_cursor": next_cursor})
+
+@feature_route("auth", "/api/profile/drafts/<draft_id>", methods=["PUT"])
+@login_required
+def save_draft(draft_id):
+    user_id = g.user_id
+    drafts = mongo.get().drafts
+    try:
+        # patch semantics: only the fields sent are written, and only they come back
+        draft = drafts.save(user_id, draft_id, request.get_json(silent=True))
+    except drafts.Error as e:
+        return jsonify({"message": str(e)}), 400
+    return jsonify({"message": "Draft saved", "draft": draft})
+
+@feature_route("auth", "/api/profile/drafts/<draft_id>", methods=["DELETE"])
+@login_required
+def delete_draft(draft_id):
+    user_id = g.user_id
+    drafts = mongo.get().drafts
+    try:
+        deleted = drafts.delete(user_id, draft_id)
+    except drafts.Error as e:
+        return jsonify({"message": str(e)}), 400
+    if not deleted:
+        return jsonify({"message": "Draft not found"}), 404
+    return jsonify({"message": "Draft deleted"})
+
 # ===================== #
 #   AI IMAGE ROUTES     #
 # ===================== #
@@ -280,47 +408,101 @@ POSE_PROMPTS = {
     "freestyle": "A creative lifestyle AI avatar presenting the product in an aesthetic pose, cinematic lighting"
 }
 
-@app.route("/api/ai/generate", methods=["POST"])
+@feature_route("ai", "/api/ai/generate", methods=["POST"])
 def generate_ai_images():
-    data = request.get_json()
-    product_image_b64 = data.get("product_image")
+    # product_image: multipart file, raw image body, or base64 in JSON (see image_io.py)
+    product_bytes, options = read_image_request(request, "product_image")
 
-    if not product_image_b64:
+    if not product_bytes:
         return jsonify({"error": "Missing product image"}), 400
 
-    product_image = Image.open(io.BytesIO(base64.b64decode(product_image_b64))).convert("RGBA")
-    results = {}
-
-    for pose_name, prompt in POSE_PROMPTS.items():
-        try:
-            model = aiplatform.ImageGenerationModel.from_pretrained("google/cog-image-alpha")
-            response = model.predict(
-                prompt=prompt,
-                max_output_tokens=256,
-                image_dimensions=(1024, 1024)
-            )
-            model_image = response.images[0].convert("RGBA")
-        except Exception as e:
-            return jsonify({"error": f"Gemini generation failed: {str(e)}"}), 500
-
-        model_no_bg = remove(model_image)
-        model_no_bg.paste(product_image, (100, 500), product_image)
-        results[pose_name] = image_to_base64(model_no_bg)
-
-    return jsonify({"results": results})
-
-@app.route("/api/ai/remove-bg", methods=["POST"])
+    # image_format (png|webp|avif|jpeg), quality, max_dim, thumbnail: see image_encoding.py
+    fmt = response_format(request, options, ("json", "multipart") + IMAGE_FORMATS)
+    try:
+        encode_opts = encode_options(options, fmt if fmt in IMAGE_FORMATS else None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    product_image = open_image(product_bytes)
+    del product_bytes
+    poses = pose_generator.generate(product_image, POSE_PROMPTS, encode_opts)
+
+    # Binary bundle: a multipart/mixed part per pose (+ "<pose>_thumbnail"), streamed as each one is ready
+    if fmt != "json":
+        def parts():
+            for pose_name, encoded, error in poses:
+                if error:
+                    body = json.dumps({"error": str(error), "status": error.status}).encode("utf-8")
+                    yield pose_name, "application/json", body
+                    continue
+                yield pose_name, MIMETYPES[encoded["format"]], encoded["image"]
+                if encoded["thumbnail"]:
+                    yield f"{pose_name}_thumbnail", MIMETYPES[encoded["format"]], encoded["thumbnail"]
+        boundary = new_boundary()
+        return Response(stream_with_context(multipart_stream(parts(), boundary)),
+                        mimetype=f"multipart/mixed; boundary={boundary}",
+                        headers={"X-Accel-Buffering": "no"})
+
+    # stream=true: one NDJSON line per pose as soon as it is ready, then {"done": true}
+    if option_flag(options, "stream"):
+        def stream():
+            for pose_name, encoded, error in poses:
+                if error:
+                    yield json.dumps({"pose": pose_name, "error": str(error), "status": error.status}) + "\n"
+                    continue
+                line = {"pose": pose_name, "image": to_base64(encoded["image"]), "format": encoded["format"]}
+                if encoded["thumbnail"]:
+                    line["thumbnail"] = to_base64(encoded["thumbnail"])
+                yield json.dumps(line) + "\n"
+            yield json.dumps({"done": True}) + "\n"
+        return Response(stream_with_context(stream()), mimetype="application/x-ndjson",
+                        headers={"X-Accel-Buffering": "no"})
+
+    results, thumbnails, formats = {}, {}, {}
+    for pose_name, encoded, error in poses:
+        if error:
+            poses.close()  # cancel the poses still waiting
+            headers = {"Retry-After": str(error.retry_after)} if error.retry_after else {}
+            return jsonify({"error": str(error)}), error.status, headers
+        results[pose_name] = to_base64(encoded["image"])
+        formats[pose_name] = encoded["format"]
+        if encoded["thumbnail"]:
+            thumbnails[pose_name] = to_base64(encoded["thumbnail"])
+
+    body = {"results": {name: results[name] for name in POSE_PROMPTS},
+            "formats": {name: formats[name] for name in POSE_PROMPTS}}
+    if thumbnails:
+        body["thumbnails"] = {name: thumbnails[name] for name in POSE_PROMPTS}
+    return jsonify(body)
+
+@feature_route("ai", "/api/ai/remove-bg", methods=["POST"])
 def remove_bg():
-    data = request.get_json()
-    image_b64 = data.get("image")
+    # image: multipart file, raw image body, or base64 in JSON (see image_io.py)
+    image_bytes, options = read_image_request(request, "image")
 
-    if not image_b64:
+    if not image_bytes:
         return jsonify({"error": "Missing image"}), 400
 
-    img = Image.open(io.BytesIO(base64.b64decode(image_b64)))
-    result = remove(img)
-    result_b64 = image_to_base64(result)
-    return jsonify({"result": result_b64})
+    # format=png|webp|avif|jpeg (or the matching Accept type) returns the image itself;
+    # image_format, quality, max_dim, thumbnail: see image_encoding.py
+    fmt = response_format(request, options, ("json",) + IMAGE_FORMATS)
+    try:
+        encode_opts = encode_options(options, fmt if fmt in IMAGE_FORMATS else None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        result_png = cutout_cache.remove(image_bytes)
+    except PoolSaturated as e:
+        return busy_response(e)
+
+    encoded = encode_png_bytes(result_png, encode_opts)
+    if fmt != "json":
+        return Response(encoded["image"], mimetype=MIMETYPES[encoded["format"]])
+    body = {"result": to_base64(encoded["image"]), "format": encoded["format"]}
+    if encoded["thumbnail"]:
+        body["thumbnail"] = to_base64(encoded["thumbnail"])
+    return jsonify(body)
 
 # ===================== #
 #   TEST / HEALTH API   #
@@ -333,10 +515,39 @@ def test():
 def health():
     return jsonify({"status": "ok"})
 
+@app.route("/provider-stats", methods=["GET"])
+def get_provider_stats():
+    subsystems = {"tts_cache": tts_cache, "rembg_pool": rembg_pool, "cutout_cache": cutout_cache,
+                  "avatar_assets": avatar_assets, "password_hasher": password_hasher, "auth_tokens": token_cache}
+    return jsonify({**provider_stats(),
+                    **{name: subsystem.stats() for name, subsystem in subsystems.items() if subsystem is not None},
+                    "features": sorted(FEATURES), "startup": startup.stats()})
+
+# ===================== #
+#   STARTUP / PRE-WARM  #
+# ===================== #
+# STARTUP_PREWARM=1 (or e.g. "rembg,image_model") builds these in a background thread right after boot
+warmups = {}
+if "auth" in FEATURES:
+    warmups["mongo"] = mongo.get
+if "media" in FEATURES:
+    warmups["avatar_images"] = avatar_assets.load
+if "ai" in FEATURES:
+    warmups["rembg"] = rembg_pool.start
+    warmups["image_model"] = lambda: pose_generator.model
+startup.boot_complete()
+boot_jobs = {}
+if "auth" in FEATURES:
+    # every boot, in the background: unique email / (user_id, draft_id) indexes and the legacy
+    # drafts migration. Idempotent, so every worker runs it: create_indexes is a no-op once
+    # the indexes exist and migrated users have no `drafts` array left to scan
+    boot_jobs["db_setup"] = setup_db
+prewarm({**boot_jobs, **prewarm_from_env(warmups)}, startup)
+
 # ===================== #
 #       MAIN ENTRY      #
 # ===================== #
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5002))
-    print(f"🚀 Server running on http://localhost:{port}")
+    print(f"🚀 Server running on http://localhost:{port} ({', '.join(sorted(FEATURES))}), {startup.summary()}")
     app.run(host="0.0.0.0", port=port)
@@ -0,0 +1,215 @@
+# backend/bg_removal.py
+# Background removal (rembg) off the Flask request thread.
+#
+# rembg runs ONNX inference that is CPU-heavy and holds the GIL in places, so
+# it runs in a small pool of worker processes. Each worker creates its rembg
+# session once in its initializer, so the model is loaded once per worker and
+# not on every call. Images cross the process boundary as encoded bytes.
+#
+# Admission is bounded: at most `workers + queue_limit` images are in flight.
+# Past that, submit() raises PoolSaturated with a Retry-After estimate, and
+# the route answers 503 instead of piling up blocked request threads. Callers
+# that fan out several images for one request (pose generation) pass `wait`
+# to queue for a free slot for up to that many seconds instead.
+#
+#   python bg_removal.py    # throughput benchmark, 512px and 1024px images
+import io
+import os
+import math
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+_session = None
+
+
+def _init_worker(model, threads):
+    global _session
+    # rembg sizes its onnxruntime thread pools from OMP_NUM_THREADS; keep
+    # workers from oversubscribing the CPU between them
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    from rembg import new_session
+    _session = new_session(model)
+
+
+def _remove_background(image_bytes):
+    from PIL import Image
+    from rembg import remove
+
+    img = Image.open(io.BytesIO(image_bytes))
+    result = remove(img, session=_session)
+    buf = io.BytesIO()
+    result.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class PoolSaturated(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"background removal queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RembgPool:
+    def __init__(self, workers=1, queue_limit=4, model="u2net", threads_per_worker=1,
+                 timeout=120, task=_remove_background, initializer=_init_worker):
+        self.workers = workers
+        self.capacity = max(workers, 1) + queue_limit
+        self.model = model
+        self.threads_per_worker = threads_per_worker
+        self.timeout = timeout
+        self.task = task
+        self.initializer = initializer
+
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._executor = None
+        self._in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._avg_seconds = None  # EWMA of submit-to-result time, queue wait included
+
+    def _get_executor(self):
+        # started on first use so importing the server stays cheap
+        if self._executor is None:
+            initargs = (self.model, self.threads_per_worker)
+            if self.workers == 0:
+                # in-process (one thread), e.g. for debugging
+                self._executor = ThreadPoolExecutor(1, initializer=self.initializer, initargs=initargs)
+            else:
+                # spawn: forking a multi-threaded Flask process is not safe
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer, initargs=initargs,
+                )
+        return self._executor
+
+    def start(self):
+        """Start the workers and load the model now instead of on the first request."""
+        with self._lock:
+            executor = self._get_executor()
+        # one no-op-sized job per worker forces every initializer to run
+        for f in [executor.submit(_ping) for _ in range(max(self.workers, 1))]:
+            f.result()
+
+    def retry_after(self):
+        # a full queue drains in roughly one current request latency
+        return max(1, math.ceil(self._avg_seconds or 1.0))
+
+    def submit(self, image_bytes, wait=0):
+        with self._lock:
+            if self._in_flight >= self.capacity and wait:
+                self._slot_free.wait_for(lambda: self._in_flight < self.capacity, timeout=wait)
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise PoolSaturated(self.retry_after())
+            self._in_flight += 1
+            executor = self._get_executor()
+        started = time.perf_counter()
+        try:
+            future = executor.submit(self.task, image_bytes)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+                self._slot_free.notify()
+            raise
+        future.add_done_callback(lambda f: self._finished(f, started))
+        return future
+
+    def _finished(self, future, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= 1
+            self._slot_free.notify()
+            if future.exception() is None:
+                self.completed += 1
+                self._avg_seconds = elapsed if self._avg_seconds is None else (
+                    0.8 * self._avg_seconds + 0.2 * elapsed)
+            else:
+                self.failed += 1
+
+    def remove(self, image_bytes, wait=0):
+        """Return the image with its background removed, as PNG bytes.
+
+        wait: seconds to wait for a free slot before raising PoolSaturated."""
+        return self.submit(image_bytes, wait=wait).result(timeout=self.timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "model": self.model,
+                "capacity": self.capacity,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_seconds": round(self._avg_seconds, 3) if self._avg_seconds else None,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _ping():
+    return True
+
+
+def pool_from_env():
+    cpus = os.cpu_count() or 1
+    workers = int(os.getenv("REMBG_WORKERS", max(1, cpus // 2)))
+    return RembgPool(
+        workers=workers,
+        queue_limit=int(os.getenv("REMBG_QUEUE_LIMIT", max(workers, 1) * 2)),
+        model=os.getenv("REMBG_MODEL", "u2net"),
+        threads_per_worker=int(os.getenv("REMBG_THREADS_PER_WORKER", max(1, cpus // max(workers, 1)))),
+        timeout=float(os.getenv("REMBG_TIMEOUT", 120)),
+    )
+
+
+# ===================== #
+#   THROUGHPUT BENCH    #
+# ===================== #
+def _test_image(size):
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (size, size), (235, 235, 235))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((size // 4, size // 8, 3 * size // 4, 7 * size // 8), fill=(180, 90, 60))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def benchmark(sizes=(512, 1024), images=16, worker_counts=None):
+    cpus = os.cpu_count() or 1
+    worker_counts = worker_counts or sorted({1, max(1, cpus // 2), cpus})
+    for size in sizes:
+        data = _test_image(size)
+
+        # baseline: inline in the calling thread (the old routes also built a
+        # new session per call, so they were slower than this)
+        _init_worker(os.getenv("REMBG_MODEL", "u2net"), cpus)
+        _remove_background(data)  # warm-up
+        t = time.perf_counter()
+        for _ in range(images):
+            _remove_background(data)
+        inline = images / (time.perf_counter() - t)
+        print(f"\n{size}px  inline, one thread: {inline:.2f} images/s")
+
+        for workers in worker_counts:
+            pool = RembgPool(workers=workers, queue_limit=images,
+                             threads_per_worker=max(1, cpus // workers))
+            pool.start()
+            t = time.perf_counter()
+            for f in [pool.submit(data) for _ in range(images)]:
+                f.result()
+            rate = images / (time.perf_counter() - t)
+            print(f"{size}px  pool, {workers} worker(s): {rate:.2f} images/s ({rate / inline:.2f}x)")
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    benchmark()
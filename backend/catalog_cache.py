@@ -0,0 +1,123 @@
+# backend/catalog_cache.py
+# In-process cache for the HeyGen avatar/voice catalogs.
+#
+# Entries are served fresh for `ttl` seconds. After that the stale copy is
+# still returned immediately while a single background thread re-fetches it
+# (stale-while-revalidate); only a cold cache or one older than `max_stale`
+# makes the caller wait on the provider. Every refresh computes a version
+# hash that the routes use as the ETag base.
+import time
+import json
+import hashlib
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class CatalogCache:
+    def __init__(self, name, fetch, ttl=300, max_stale=24 * 3600):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.items = None
+        self.version = None
+        self.fetched_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self):
+        """Return (items, version), fetching synchronously only when cold."""
+        age = time.time() - self.fetched_at
+        if self.items is not None and age < self.max_stale:
+            self.hits += 1
+            if age >= self.ttl:
+                self.refresh_async()
+            return self.items, self.version
+
+        self.misses += 1
+        with self._lock:
+            # another request may have filled it while we waited
+            if self.items is not None and time.time() - self.fetched_at < self.max_stale:
+                return self.items, self.version
+            try:
+                self._refresh()
+            except Exception:
+                if self.items is None:
+                    raise
+                log.exception("%s catalog refresh failed; serving stale copy", self.name)
+        return self.items, self.version
+
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name=f"{self.name}-refresh", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self._refresh()
+        except Exception:
+            self.refresh_errors += 1
+            log.exception("%s catalog background refresh failed", self.name)
+        finally:
+            self._refreshing = False
+
+    def _refresh(self):
+        items = self.fetch()
+        raw = json.dumps(items, sort_keys=True, separators=(",", ":")).encode()
+        self.items = items
+        self.version = hashlib.sha1(raw).hexdigest()[:16]
+        self.fetched_at = time.time()
+
+    def stats(self):
+        return {
+            "items": len(self.items) if self.items is not None else 0,
+            "age_seconds": round(time.time() - self.fetched_at, 1) if self.items is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+# ==========================
+# Query helpers for the list routes
+# ==========================
+def parse_bool(value):
+    if value is None:
+        return None
+    return value.strip().lower() in ("1", "true", "yes")
+
+
+def filter_items(items, gender=None, language=None, is_public=None):
+    out = items
+    if gender:
+        gender = gender.lower()
+        out = [i for i in out if (i.get("gender") or "").lower() == gender]
+    if language:
+        language = language.lower()
+        out = [i for i in out if (i.get("language") or "").lower().startswith(language)]
+    if is_public is not None:
+        out = [i for i in out if bool(i.get("is_public")) == is_public]
+    return out
+
+
+def paginate(items, page=None, page_size=None, max_page_size=200):
+    """Slice `items`; without `page`/`page_size` the full list is returned."""
+    if page is None and page_size is None:
+        return items, None
+    page = max(int(page or 1), 1)
+    page_size = min(max(int(page_size or 50), 1), max_page_size)
+    start = (page - 1) * page_size
+    return items[start:start + page_size], {"page": page, "page_size": page_size}
+
+
+def query_etag(version, args):
+    """ETag for one filtered/paginated view of a catalog version."""
+    key = version + "|" + "&".join(f"{k}={args[k]}" for k in sorted(args))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
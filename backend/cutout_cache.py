@@ -0,0 +1,196 @@
+# backend/cutout_cache.py
+# Content-addressed cache for background-removal (rembg) results.
+#
+# The key is a SHA-256 of the input image bytes plus the rembg parameters
+# (model), so re-uploading the same product image skips inference entirely.
+# Results live on disk as cutout_<key>.png (atomic temp-file + rename, LRU
+# eviction under `max_bytes`) with a small in-memory hot tier (LRU under
+# `hot_bytes`) in front, so a repeat request costs a hash and a dict lookup.
+# Concurrent misses for the same image wait for one inference.
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class CutoutCache:
+    def __init__(self, directory, remove, params="", max_bytes=512 * 1024 * 1024, hot_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.remove_background = remove
+        self.params = params
+        self.max_bytes = max_bytes
+        self.hot_bytes = hot_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = OrderedDict()  # filename -> size on disk, oldest first
+        self._bytes = 0
+        self._hot = OrderedDict()      # key -> result bytes, oldest first
+        self._hot_size = 0
+        self.hot_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0           # result bytes served without running rembg
+        self.seconds_saved = 0.0       # estimated from the average miss time
+        self._miss_seconds = None
+        self._load_index()
+
+    def key(self, image_bytes):
+        digest = hashlib.sha256()
+        digest.update(self.params.encode("utf-8") + b"\0")
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _load_index(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.startswith("cutout_") or not name.endswith(".png"):
+                continue
+            st = os.stat(os.path.join(self.directory, name))
+            files.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+
+    def _lookup(self, key):
+        """Hot tier, then disk; counts the hit. The disk read runs outside
+        self._lock, so one slow read does not stall every other request."""
+        name = f"cutout_{key}.png"
+        with self._lock:
+            data = self._hot.get(key)
+            if data is not None:
+                self._hot.move_to_end(key)
+                if name in self._entries:
+                    self._entries.move_to_end(name)
+                self.hot_hits += 1
+                return self._hit(data)
+            if name not in self._entries:
+                return None
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self._bytes -= self._entries.pop(name, 0)
+            return None
+        with self._lock:
+            if name in self._entries:  # unless evicted while we read
+                self._entries.move_to_end(name)
+                self._remember(key, data)
+            self.disk_hits += 1
+            return self._hit(data)
+
+    def _hit(self, data):
+        self.bytes_saved += len(data)
+        self.seconds_saved += self._miss_seconds or 0.0
+        return data
+
+    def remove(self, image_bytes, **options):
+        """Background-removed PNG bytes for image_bytes, from cache when possible.
+
+        options (e.g. RembgPool's `wait`) are passed to the remover on a miss."""
+        key = self.key(image_bytes)
+        data = self._lookup(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # one inference per image; concurrent requests for the same image wait
+        with key_lock:
+            data = self._lookup(key)
+            if data is not None:
+                return data
+            with self._lock:
+                self.misses += 1
+            try:
+                started = time.perf_counter()
+                data = self.remove_background(image_bytes, **options)
+                elapsed = time.perf_counter() - started
+                name = f"cutout_{key}.png"
+                self._write(name, data)
+                # registered before the key lock is released, so a waiter (or a
+                # request that takes a fresh key lock) finds it in the hot tier
+                with self._lock:
+                    self._miss_seconds = elapsed if self._miss_seconds is None else 0.8 * self._miss_seconds + 0.2 * elapsed
+                    self._bytes += len(data) - self._entries.pop(name, 0)
+                    self._entries[name] = len(data)
+                    self._remember(key, data)
+                    self._evict(keep=name)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return data
+
+    def _remember(self, key, data):
+        if len(data) > self.hot_bytes:
+            return
+        self._hot_size += len(data) - len(self._hot.pop(key, b""))
+        self._hot[key] = data
+        while self._hot_size > self.hot_bytes:
+            _, old = self._hot.popitem(last=False)
+            self._hot_size -= len(old)
+
+    def _write(self, name, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp_", suffix=".png")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _evict(self, keep):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                self._entries.move_to_end(name)
+                continue
+            self._entries.pop(name)
+            self._bytes -= size
+            self.evictions += 1
+            old = self._hot.pop(name[len("cutout_"):-len(".png")], None)
+            if old is not None:
+                self._hot_size -= len(old)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                log.warning("could not evict cached cutout %s", name)
+
+    def stats(self):
+        with self._lock:
+            hits = self.hot_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hot_entries": len(self._hot),
+                "hot_bytes": self._hot_size,
+                "hot_hits": self.hot_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "seconds_saved": round(self.seconds_saved, 2),
+                "evictions": self.evictions,
+            }
+
+
+def cache_from_env(default_dir, remove, params=""):
+    directory = os.getenv("CUTOUT_CACHE_DIR", default_dir)
+    max_mb = float(os.getenv("CUTOUT_CACHE_MAX_MB", 512))
+    hot_mb = float(os.getenv("CUTOUT_CACHE_HOT_MB", 64))
+    return CutoutCache(directory, remove, params=params,
+                       max_bytes=int(max_mb * 1024 * 1024), hot_bytes=int(hot_mb * 1024 * 1024))
@@ -0,0 +1,261 @@
+# backend/draft_store.py
+# Per-user drafts in their own `drafts` collection.
+#
+# Drafts used to be an array on the user document that update_profile $set
+# wholesale, so every save rewrote (and returned) every draft and the user
+# document grew without bound. Each draft is now its own document keyed by
+# (user_id, draft_id): a save is one upsert that returns only the fields it
+# changed, a delete touches one draft, and listing is keyset-paginated
+# (newest first) off the (user_id, updated_at, _id) index.
+#
+#   python draft_store.py    # save cost, embedded array vs. per-draft upsert
+import os
+import time
+import logging
+import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from user_store import ensure_indexes
+
+log = logging.getLogger(__name__)
+
+DRAFT_INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("draft_id", ASCENDING)], unique=True, name="user_draft_unique"),
+    IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], name="user_recent"),
+]
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DRAFTS_PAGE_SIZE", 20))
+MAX_PAGE_SIZE = int(os.getenv("DRAFTS_MAX_PAGE_SIZE", 100))
+MAX_DRAFT_ID_LENGTH = 128
+RESERVED_FIELDS = {"_id", "user_id", "draft_id", "created_at", "updated_at"}
+
+
+class DraftError(ValueError):
+    """Bad draft id, fields or cursor; the message is client-facing."""
+
+
+def _utcnow():
+    # BSON dates have millisecond precision; truncate so cursors round-trip exactly
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000, tzinfo=None)
+
+
+def _iso(value):
+    return value.isoformat(timespec="milliseconds") + "Z" if isinstance(value, datetime.datetime) else value
+
+
+def _public(doc):
+    doc.pop("_id", None)
+    doc.pop("user_id", None)
+    for field in ("created_at", "updated_at"):
+        if field in doc:
+            doc[field] = _iso(doc[field])
+    return doc
+
+
+def _check_draft_id(draft_id):
+    draft_id = str(draft_id) if draft_id is not None else ""
+    if not draft_id or len(draft_id) > MAX_DRAFT_ID_LENGTH:
+        raise DraftError(f"draft id must be 1-{MAX_DRAFT_ID_LENGTH} characters")
+    return draft_id
+
+
+def _check_fields(fields):
+    if not isinstance(fields, dict) or not fields:
+        raise DraftError("draft must be a non-empty JSON object")
+    for name in fields:
+        if name in RESERVED_FIELDS or name.startswith("$") or "." in name:
+            raise DraftError(f"invalid draft field: {name}")
+    return fields
+
+
+def encode_cursor(doc):
+    return f"{int(doc['updated_at'].replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)}_{doc['_id']}"
+
+
+def decode_cursor(cursor):
+    try:
+        millis, oid = cursor.split("_", 1)
+        updated_at = datetime.datetime.fromtimestamp(int(millis) / 1000, datetime.timezone.utc).replace(tzinfo=None)
+        return updated_at, ObjectId(oid)
+    except Exception:
+        raise DraftError("invalid cursor")
+
+
+class DraftStore:
+    # routes that only hold the store (loaded lazily) catch `drafts.Error`
+    Error = DraftError
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        return ensure_indexes(self.collection, DRAFT_INDEXES)
+
+    def save(self, user_id, draft_id, fields):
+        """Create or patch one draft; returns only the saved fields (+ draft_id, timestamps).
+
+        Fields not in `fields` are left as they are."""
+        draft_id = _check_draft_id(draft_id)
+        fields = _check_fields(fields)
+        now = _utcnow()
+        projection = {name: 1 for name in fields}
+        projection.update({"_id": 0, "draft_id": 1, "created_at": 1, "updated_at": 1})
+        query = {"user_id": ObjectId(user_id), "draft_id": draft_id}
+        update = {"$set": {**fields, "updated_at": now}, "$setOnInsert": {"created_at": now}}
+        try:
+            doc = self.collection.find_one_and_update(
+                query, update, projection=projection, upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            # two first saves of the same draft raced on the unique (user_id, draft_id)
+            # index and the other one inserted it: apply this save as a plain update
+            doc = self.collection.find_one_and_update(
+                query, update, projection=projection, return_document=ReturnDocument.AFTER)
+        return _public(doc)
+
+    @staticmethod
+    def _legacy_op(user_oid, draft, now):
+        """(draft_id, UpdateOne) for one draft of a legacy `drafts` array."""
+        if not isinstance(draft, dict):
+            raise DraftError("each draft must be a JSON object")
+        fields = {k: v for k, v in draft.items() if k not in RESERVED_FIELDS and k != "id"}
+        draft_id = _check_draft_id(draft.get("id") or draft.get("draft_id") or draft.get("timestamp"))
+        return draft_id, UpdateOne({"user_id": user_oid, "draft_id": draft_id},
+                                   {"$set": {**_check_fields(fields), "updated_at": now},
+                                    "$setOnInsert": {"created_at": now}},
+                                   upsert=True)
+
+    def _write(self, ops):
+        if not ops:
+            return 0
+        result = self.collection.bulk_write(ops, ordered=False)
+        return result.upserted_count + result.modified_count
+
+    def replace_all(self, user_id, drafts):
+        """Make the user's drafts exactly `drafts` (legacy whole-array saves):
+        upsert the ones sent and delete the ones left out.
+
+        The whole list is validated before anything is written. Returns
+        (saved, deleted)."""
+        if not isinstance(drafts, list):
+            raise DraftError("drafts must be a JSON array")
+        user_oid = ObjectId(user_id)
+        now = _utcnow()
+        ops = {}  # draft_id -> op; a repeated id keeps its last entry
+        for draft in drafts:
+            draft_id, op = self._legacy_op(user_oid, draft, now)
+            ops[draft_id] = op
+        saved = self._write(list(ops.values()))
+        deleted = self.collection.delete_many({"user_id": user_oid, "draft_id": {"$nin": list(ops)}})
+        return saved, deleted.deleted_count
+
+    def delete(self, user_id, draft_id):
+        result = self.collection.delete_one({"user_id": ObjectId(user_id), "draft_id": _check_draft_id(draft_id)})
+        return result.deleted_count == 1
+
+    def list(self, user_id, limit=None, cursor=None):
+        """One page of drafts, most recently saved first.
+
+        Returns (drafts, next_cursor); next_cursor is None on the last page."""
+        try:
+            limit = int(limit) if limit not in (None, "") else DEFAULT_PAGE_SIZE
+        except (TypeError, ValueError):
+            raise DraftError("limit must be an integer")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        query = {"user_id": ObjectId(user_id)}
+        if cursor:
+            updated_at, oid = decode_cursor(cursor)
+            query["$or"] = [
+                {"updated_at": {"$lt": updated_at}},
+                {"updated_at": updated_at, "_id": {"$lt": oid}},
+            ]
+        docs = list(self.collection.find(query, {"user_id": 0})
+                    .sort([("updated_at", DESCENDING), ("_id", DESCENDING)])
+                    .limit(limit + 1))
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        return [_public(doc) for doc in docs[:limit]], next_cursor
+
+    def migrate_embedded(self, users):
+        """Move legacy `drafts` arrays off user documents. Idempotent; never raises.
+
+        Drafts that fail validation are logged and left on the user document
+        (the rest of that user's drafts still move); other users are not
+        affected."""
+        moved = skipped = 0
+        try:
+            for user in users.find({"drafts": {"$exists": True}}, {"drafts": 1}):
+                user_oid = ObjectId(user["_id"])
+                now = _utcnow()
+                ops, bad = [], []
+                for i, draft in enumerate(user.get("drafts") or []):
+                    try:
+                        if isinstance(draft, dict):
+                            draft = dict(draft)
+                            draft.setdefault("id", draft.get("draft_id") or draft.get("timestamp") or f"legacy-{i}")
+                        ops.append(self._legacy_op(user_oid, draft, now)[1])
+                    except DraftError as e:
+                        log.warning("user %s: skipping embedded draft %d: %s", user["_id"], i, e)
+                        bad.append(draft)
+                try:
+                    moved += self._write(ops)
+                except Exception as e:
+                    log.warning("user %s: could not move embedded drafts: %s", user["_id"], e)
+                    skipped += 1
+                    continue
+                if bad:
+                    users.update_one({"_id": user["_id"]}, {"$set": {"drafts": bad}})
+                    skipped += 1
+                else:
+                    users.update_one({"_id": user["_id"]}, {"$unset": {"drafts": ""}})
+        except Exception as e:
+            log.warning("embedded draft migration stopped early: %s", e)
+        if moved:
+            log.info("moved %d embedded drafts into the drafts collection", moved)
+        if skipped:
+            log.warning("%d users still have embedded drafts that need attention", skipped)
+        return moved
+
+
+# ===================== #
+#   SAVE BENCHMARK      #
+# ===================== #
+def benchmark(draft_counts=(10, 100, 500), draft_bytes=2_000, saves=50):
+    import bson
+    import mongomock
+
+    db = mongomock.MongoClient()["fashion_ai_bench"]
+    payload = "x" * draft_bytes
+    print(f"one draft edit, {draft_bytes:,}-byte drafts, mean of {saves} saves (mongomock)")
+    for count in draft_counts:
+        drafts = [{"id": str(i), "title": f"Draft {i}", "body": payload} for i in range(count)]
+
+        user_id = db.users.insert_one({"email": "bench@example.com", "drafts": drafts}).inserted_id
+        t = time.perf_counter()
+        for j in range(saves):
+            drafts[0]["title"] = f"edit {j}"
+            doc = db.users.find_one_and_update({"_id": user_id}, {"$set": {"drafts": drafts}},
+                                               return_document=ReturnDocument.AFTER)
+        embedded_ms = (time.perf_counter() - t) * 1000 / saves
+        embedded_bytes = len(bson.encode({"drafts": drafts})) + len(bson.encode(doc))
+
+        store = DraftStore(db.drafts)
+        for draft in drafts:  # (mongomock's bulk_write is not compatible with current pymongo)
+            store.save(user_id, draft["id"], {k: v for k, v in draft.items() if k != "id"})
+        t = time.perf_counter()
+        for j in range(saves):
+            doc = store.save(user_id, "0", {"title": f"edit {j}"})
+        split_ms = (time.perf_counter() - t) * 1000 / saves
+        split_bytes = len(bson.encode({"title": "edit 0"})) + len(bson.encode(doc))
+
+        print(f"  {count:>4} drafts  embedded array: {embedded_ms:7.2f} ms {embedded_bytes / 1024:8.1f} KiB sent+returned   "
+              f"per-draft: {split_ms:6.2f} ms {split_bytes:5d} B")
+        db.users.drop()
+        db.drafts.drop()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,81 @@
+# backend/fake_heygen.py
+# Minimal local stand-in for the HeyGen API, for exercising the job queue
+# without an account or network access.
+#
+#   python fake_heygen.py                      # listens on :5055
+#   HEYGEN_API_BASE=http://localhost:5055 python promo.py
+#
+# Videos "render" for FAKE_HEYGEN_RENDER_SECONDS and then report completed.
+# A script containing the word "fail" produces a failed video.
+import os
+import json
+import time
+import uuid
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+RENDER_SECONDS = float(os.getenv("FAKE_HEYGEN_RENDER_SECONDS", 10))
+
+VIDEOS = {}
+LOCK = threading.Lock()
+STATS = {"generate": 0, "status": 0}
+
+
+class FakeHeyGenHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, code, body):
+        raw = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if url.path != "/v2/video/generate":
+            return self._send(404, {"error": "not found"})
+        video_id = uuid.uuid4().hex
+        with LOCK:
+            STATS["generate"] += 1
+            VIDEOS[video_id] = {"created": time.time(), "fail": "fail" in json.dumps(body)}
+        self._send(200, {"error": None, "data": {"video_id": video_id}})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            return self._send(200, STATS)
+        if url.path not in ("/v2/video/status", "/v2/video/get-status"):
+            return self._send(404, {"error": "not found"})
+        video_id = parse_qs(url.query).get("video_id", [None])[0]
+        with LOCK:
+            STATS["status"] += 1
+            video = VIDEOS.get(video_id)
+        if not video:
+            return self._send(404, {"error": "unknown video_id"})
+        if time.time() - video["created"] < RENDER_SECONDS:
+            return self._send(200, {"data": {"status": "processing"}})
+        if video["fail"]:
+            return self._send(200, {"data": {"status": "failed", "error": "fake failure"}})
+        video_url = f"http://localhost/fake/{video_id}.mp4"
+        self._send(200, {"data": {"status": "completed", "video_url": video_url, "result_url": video_url}})
+
+
+def serve(port=5055):
+    server = ThreadingHTTPServer(("0.0.0.0", port), FakeHeyGenHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    port = int(os.getenv("FAKE_HEYGEN_PORT", 5055))
+    print(f"Fake HeyGen listening on http://localhost:{port}")
+    serve(port).serve_forever()
@@ -0,0 +1,309 @@
+# backend/heygen_jobs.py
+# Background job subsystem for HeyGen video generation.
+#
+# The HTTP endpoint only records a job and returns its id; a poller thread
+# submits queued jobs to HeyGen and tracks every outstanding video id in
+# batches. Job state lives in a small SQLite file so /video-status can be
+# answered locally, and jobs survive a server restart (the poller resumes
+# pending jobs at startup).
+#
+# Several worker processes (gunicorn) may share one jobs file and each runs a
+# poller, so a queued job is claimed with an atomic queued -> submitting
+# UPDATE before it is POSTed: exactly one process submits each paid video.
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from provider_client import get_client
+
+log = logging.getLogger(__name__)
+
+# Job lifecycle: queued -> submitting -> processing -> completed | failed
+QUEUED = "queued"
+SUBMITTING = "submitting"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+PENDING_STATES = (QUEUED, SUBMITTING, PROCESSING)
+
+DONE_STATUSES = ("completed", "succeeded", "done", "finished")
+FAILED_STATUSES = ("failed", "error")
+
+
+# ==========================
+# Local job store (SQLite)
+# ==========================
+class JobStore:
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # timeout: wait for another process's write lock instead of failing
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT,
+                    video_id TEXT,
+                    video_url TEXT,
+                    error TEXT,
+                    details TEXT,
+                    created_at REAL,
+                    updated_at REAL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_video_id ON jobs(video_id)")
+
+    def create(self, payload):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(payload), now, now),
+            )
+        return job_id
+
+    def update(self, job_id, **fields):
+        if "details" in fields and not isinstance(fields["details"], (str, type(None))):
+            fields["details"] = json.dumps(fields["details"])
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def claim(self, job_id, from_status=QUEUED, to_status=SUBMITTING):
+        """Atomically move a job from_status -> to_status; False if another poller got it first."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (to_status, time.time(), job_id, from_status),
+            )
+        return cur.rowcount == 1
+
+    def fail_stale(self, status, older_than, error):
+        """Fail jobs stuck in `status` since before `older_than`; returns how many."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (FAILED, error, time.time(), status, older_than),
+            )
+        return cur.rowcount
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def get_by_video_id(self, video_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE video_id = ?", (video_id,)).fetchone()
+        return self._to_dict(row)
+
+    def pending(self, status, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY updated_at LIMIT ?", (status, limit)
+            ).fetchall()
+        return [self._to_dict(r, with_payload=True) for r in rows]
+
+    def has_pending(self):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT 1 FROM jobs WHERE status IN ({', '.join('?' * len(PENDING_STATES))}) LIMIT 1",
+                PENDING_STATES,
+            ).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _to_dict(row, with_payload=False):
+        if row is None:
+            return None
+        job = dict(row)
+        payload = job.pop("payload", None)
+        if with_payload:
+            job["payload"] = json.loads(payload) if payload else None
+        if job.get("details"):
+            try:
+                job["details"] = json.loads(job["details"])
+            except ValueError:
+                pass
+        return job
+
+
+# ==========================
+# Background poller
+# ==========================
+class HeyGenJobManager:
+    """Submits queued jobs and polls outstanding HeyGen video ids in batches."""
+
+    def __init__(self, api_key, store, status_path="/v2/video/get-status",
+                 client=None, poll_interval=5.0,
+                 batch_size=20, max_workers=4, job_timeout=30 * 60, submit_lease=5 * 60):
+        self.api_key = api_key
+        self.store = store
+        self.status_path = status_path
+        self.client = client or get_client("heygen")
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.job_timeout = job_timeout
+        # a job left in `submitting` this long belonged to a process that died mid-POST
+        self.submit_lease = submit_lease
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def headers(self):
+        return {"X-Api-Key": self.api_key, "Content-Type": "application/json"}
+
+    # ---- public API used by the Flask routes ----
+    def enqueue(self, payload):
+        job_id = self.store.create(payload)
+        self.start()
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id=None, video_id=None):
+        if self.store.has_pending():
+            self.start()
+        if job_id:
+            return self.store.get(job_id)
+        if video_id:
+            return self.store.get_by_video_id(video_id)
+        return None
+
+    def resume(self):
+        """Start the poller if the store has pending jobs (e.g. from before a restart)."""
+        if self.store.has_pending():
+            self.start()
+            self._wake.set()
+            return True
+        return False
+
+    def start(self):
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="heygen-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    # ---- poller loop ----
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="heygen") as pool:
+            while not self._stop.is_set():
+                try:
+                    self.tick(pool)
+                except Exception:
+                    log.exception("heygen poller tick failed")
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def tick(self, pool=None):
+        """Run one submit + poll round. Exposed so it can be driven directly."""
+        # whether HeyGen got the POST is unknown, so fail rather than risk a second paid video
+        self.store.fail_stale(SUBMITTING, time.time() - self.submit_lease,
+                              "Submission interrupted; please retry")
+        queued = [job for job in self.store.pending(QUEUED, self.batch_size) if self.store.claim(job["id"])]
+        processing = self.store.pending(PROCESSING, self.batch_size)
+        if pool is None:
+            for job in queued:
+                self._submit(job)
+            for job in processing:
+                self._poll(job)
+            return
+        list(pool.map(self._submit, queued))
+        list(pool.map(self._poll, processing))
+
+    def _submit(self, job):
+        try:
+            resp = self.client.post(
+                "/v2/video/generate",
+                json=job["payload"],
+                headers=self.headers,
+                timeout=60,
+            )
+            try:
+                data = resp.json()
+            except ValueError:
+                data = {"status_code": resp.status_code, "text": resp.text}
+            if resp.status_code not in (200, 201) or not isinstance(data.get("data"), dict):
+                self.store.update(job["id"], status=FAILED,
+                                  error="HeyGen generation failed", details=data)
+                return
+            video_id = data["data"].get("video_id") or data["data"].get("id")
+            if not video_id:
+                self.store.update(job["id"], status=FAILED,
+                                  error="HeyGen did not return video_id", details=data)
+                return
+            self.store.update(job["id"], status=PROCESSING, video_id=video_id)
+        except Exception as e:
+            log.exception("heygen submit failed for job %s", job["id"])
+            self.store.update(job["id"], status=FAILED, error=str(e))
+
+    def _poll(self, job):
+        if time.time() - job["created_at"] > self.job_timeout:
+            self.store.update(job["id"], status=FAILED, error="Video generation timeout")
+            return
+        try:
+            resp = self.client.get(
+                self.status_path,
+                params={"video_id": job["video_id"]},
+                headers=self.headers,
+                timeout=20,
+            )
+            status_json = resp.json()
+        except Exception as e:
+            # transient: keep the job and retry on the next round
+            log.warning("heygen status check failed for %s: %s", job["video_id"], e)
+            self.store.update(job["id"])
+            return
+
+        data = status_json.get("data") or {}
+        status = (data.get("status") or status_json.get("status") or "").lower()
+        if status in DONE_STATUSES:
+            video_url = data.get("video_url") or data.get("result_url") or status_json.get("result_url")
+            if video_url:
+                self.store.update(job["id"], status=COMPLETED, video_url=video_url)
+                return
+        elif status in FAILED_STATUSES:
+            self.store.update(job["id"], status=FAILED, error="Generation failed", details=data)
+            return
+        # still running; bump updated_at so the oldest-checked jobs go first
+        self.store.update(job["id"])
+
+
+def job_response(job):
+    """Shape a stored job for the /video-status JSON response."""
+    body = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "video_id": job.get("video_id"),
+    }
+    if job["status"] == COMPLETED:
+        body["success"] = True
+        body["video_url"] = job["video_url"]
+    elif job["status"] == FAILED:
+        body["error"] = job.get("error")
+        if job.get("details"):
+            body["details"] = job["details"]
+    return body
@@ -0,0 +1,175 @@
+# backend/image_encoding.py
+# Output encoding for generated / cut-out images.
+#
+# Requests pick the format (png, webp, avif when Pillow has it, jpeg for
+# opaque images), quality, a max dimension, and whether to add a thumbnail
+# for gallery views. Encoding runs inline on the caller's thread: the pose
+# workers and request threads already encode concurrently (Pillow releases
+# the GIL inside its codecs), so a pool here only added a hand-off.
+#
+#   python image_encoding.py    # encode time and size per format, 1024px RGBA
+import io
+import os
+import time
+from typing import Optional
+from dataclasses import dataclass
+
+IMAGE_FORMATS = ("png", "webp", "avif", "jpeg")
+MIMETYPES = {"png": "image/png", "webp": "image/webp", "avif": "image/avif", "jpeg": "image/jpeg"}
+
+DEFAULT_QUALITY = int(os.getenv("IMAGE_QUALITY", 85))
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL", 6))
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", 256))
+MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", 4096))
+
+_avif = None
+
+
+def avif_available():
+    global _avif
+    if _avif is None:
+        from PIL import features
+        _avif = bool(features.check("avif"))
+        if not _avif:
+            try:
+                import pillow_avif  # noqa: F401  (plugin for Pillow < 11.3)
+                _avif = True
+            except ImportError:
+                pass
+    return _avif
+
+
+@dataclass
+class EncodeOptions:
+    format: str = "png"
+    quality: int = DEFAULT_QUALITY
+    max_dim: Optional[int] = None
+    thumbnail: bool = False
+
+    @property
+    def is_default(self):
+        """Full-size PNG with no thumbnail: a PNG input can be passed through untouched."""
+        return self.format == "png" and not self.max_dim and not self.thumbnail
+
+
+def encode_options(options, image_format=None):
+    """EncodeOptions from request options (image_format, quality, max_dim, thumbnail).
+
+    Raises ValueError with a client-facing message on bad values."""
+    fmt = str(options.get("image_format") or image_format or "png").lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"image_format must be one of {', '.join(IMAGE_FORMATS)}")
+
+    quality = options.get("quality", DEFAULT_QUALITY)
+    max_dim = options.get("max_dim")
+    try:
+        quality = int(quality)
+        max_dim = int(max_dim) if max_dim not in (None, "") else None
+    except (TypeError, ValueError):
+        raise ValueError("quality and max_dim must be integers")
+    if not 1 <= quality <= 100:
+        raise ValueError("quality must be between 1 and 100")
+    if max_dim is not None and not 16 <= max_dim <= MAX_DIMENSION:
+        raise ValueError(f"max_dim must be between 16 and {MAX_DIMENSION}")
+
+    thumbnail = options.get("thumbnail")
+    thumbnail = thumbnail is True or str(thumbnail).strip().lower() in ("1", "true", "yes")
+    return EncodeOptions(fmt, quality, max_dim, thumbnail)
+
+
+def _has_alpha(img):
+    if img.mode in ("RGBA", "LA", "PA"):
+        return img.getchannel("A").getextrema()[0] < 255
+    return img.mode == "P" and "transparency" in img.info
+
+
+def _fit(img, max_dim):
+    if max_dim and max(img.size) > max_dim:
+        from PIL import Image
+        img = img.copy()
+        img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    return img
+
+
+def encode(img, fmt="png", quality=DEFAULT_QUALITY, max_dim=None):
+    """Encode a PIL image; returns (bytes, format actually used).
+
+    JPEG is only used for opaque images and AVIF only when available; both
+    fall back to WebP, which keeps transparency."""
+    if fmt == "jpeg" and _has_alpha(img):
+        fmt = "webp"
+    if fmt == "avif" and not avif_available():
+        fmt = "webp"
+    img = _fit(img, max_dim)
+
+    buf = io.BytesIO()
+    if fmt == "webp":
+        img.save(buf, format="WEBP", quality=quality, method=4)
+    elif fmt == "avif":
+        img.save(buf, format="AVIF", quality=quality)
+    elif fmt == "jpeg":
+        img.convert("RGB").save(buf, format="JPEG", quality=quality, optimize=True)
+    else:
+        img.save(buf, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return buf.getvalue(), fmt
+
+
+def encode_variants(img, opts):
+    """Encode the image (and its thumbnail, if asked for).
+
+    Returns {"image": bytes, "format": str, "thumbnail": bytes | None}."""
+    data, fmt = encode(img, opts.format, opts.quality, opts.max_dim)
+    thumbnail = encode(img, opts.format, opts.quality, THUMBNAIL_SIZE)[0] if opts.thumbnail else None
+    return {"image": data, "format": fmt, "thumbnail": thumbnail}
+
+
+def encode_png_bytes(png_bytes, opts):
+    """encode_variants() for PNG input (e.g. a cut-out); default options skip the decode."""
+    if opts.is_default:
+        return {"image": png_bytes, "format": "png", "thumbnail": None}
+    from PIL import Image
+    img = Image.open(io.BytesIO(png_bytes))
+    img.load()
+    return encode_variants(img, opts)
+
+
+# ===================== #
+#   ENCODE BENCHMARK    #
+# ===================== #
+def _test_image(size=1024):
+    from PIL import Image, ImageDraw, ImageFilter
+
+    # textured gradient + soft-edged subject, roughly like a cut-out avatar photo
+    band = Image.blend(Image.linear_gradient("L").resize((size, size)), Image.effect_noise((size, size), 40), 0.3)
+    img = Image.merge("RGB", (band, band.rotate(90), band.rotate(180)))
+    img.paste((40, 40, 40), (size // 3, size // 3, 2 * size // 3, size // 2))  # some hard edges
+    mask = Image.new("L", (size, size), 0)
+    ImageDraw.Draw(mask).ellipse((size // 5, size // 10, 4 * size // 5, 19 * size // 20), fill=255)
+    img.putalpha(mask.filter(ImageFilter.GaussianBlur(size // 100)))
+    return img
+
+
+def benchmark(size=1024, runs=5):
+    img = _test_image(size)
+    opaque = img.convert("RGB")
+    cases = [("png", None), ("webp", 85), ("webp", 60), ("avif", 60), ("jpeg", 85)]
+    print(f"{size}x{size} RGBA, best of {runs}; jpeg on the opaque version")
+    for max_dim in (None, 512, THUMBNAIL_SIZE):
+        for fmt, quality in cases:
+            source = opaque if fmt == "jpeg" else img
+            best = None
+            for _ in range(runs):
+                t = time.perf_counter()
+                data, used = encode(source, fmt, quality or DEFAULT_QUALITY, max_dim)
+                elapsed = time.perf_counter() - t
+                best = elapsed if best is None else min(best, elapsed)
+            label = f"{used}" + (f" q{quality}" if quality else "")
+            dim = f"max_dim {max_dim}" if max_dim else "full size"
+            print(f"  {dim:<12} {label:<10} {best * 1000:7.1f} ms  {len(data) / 1024:8.1f} KiB")
+        print()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,247 @@
+# backend/image_io.py
+# Binary image I/O for the image routes, as an alternative to base64-in-JSON.
+#
+# Requests may send the image as:
+#   - multipart/form-data file field   (no base64 at all)
+#   - a raw body: image/*, application/octet-stream
+#   - a raw base64 body: text/plain     (decoded while it streams in)
+#   - JSON with a base64 string field   (the original format, still the default)
+#
+# Responses are negotiated with ?format= (or the same field in the body) or
+# the Accept header: json (default), an image type (png, webp, avif, jpeg), or
+# multipart, which streams a multipart/mixed bundle of images, one part per
+# pose. How the images are encoded is up to image_encoding.py.
+#
+# Base64 is decoded in fixed-size chunks into one growing buffer, so the
+# encoded and decoded copies are never both held in full (base64.b64decode
+# on a str makes an extra ASCII copy first, and request.get_json() keeps the
+# raw body cached for the whole request).
+#
+#   python image_io.py    # peak-RSS benchmark of the request/response modes
+import io
+import os
+import sys
+import json
+import uuid
+import base64
+import shutil
+import binascii
+
+BASE64_CHUNK = 64 * 1024  # multiple of 4
+_WHITESPACE = b" \t\r\n"
+
+RESPONSE_FORMATS = {
+    "application/json": "json",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/avif": "avif",
+    "image/jpeg": "jpeg",
+    "multipart/mixed": "multipart",
+}
+
+
+# ===================== #
+#   STREAMING DECODER   #
+# ===================== #
+def _chunks(source):
+    if isinstance(source, (str, bytes)):
+        for i in range(0, len(source), BASE64_CHUNK):
+            yield source[i:i + BASE64_CHUNK]
+    else:
+        while True:
+            chunk = source.read(BASE64_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+def decode_base64(source, out=None):
+    """Decode base64 from a str/bytes or a readable stream, chunk by chunk.
+
+    Whitespace and a leading data: URL header are skipped. Returns the decoded
+    bytes (BytesIO.getvalue() hands over its buffer without another copy)."""
+    out = out or io.BytesIO()
+    pending = b""
+    first = True
+    for chunk in _chunks(source):
+        if isinstance(chunk, str):
+            chunk = chunk.encode("ascii")
+        if first:
+            first = False
+            if chunk.startswith(b"data:") and b"," in chunk:
+                chunk = chunk.split(b",", 1)[1]
+        pending += chunk.translate(None, _WHITESPACE)
+        cut = len(pending) - len(pending) % 4
+        if cut:
+            out.write(binascii.a2b_base64(pending[:cut]))
+            pending = pending[cut:]
+    if pending:
+        out.write(binascii.a2b_base64(pending + b"=" * (-len(pending) % 4)))
+    return out.getvalue()
+
+
+def open_image(image_bytes, mode="RGBA"):
+    """Decode request image bytes into a PIL image (Pillow loads on first use)."""
+    from PIL import Image
+    return Image.open(io.BytesIO(image_bytes)).convert(mode)
+
+
+# ===================== #
+#   REQUESTS            #
+# ===================== #
+def read_image_request(req, field):
+    """Return (image_bytes or None, options) for a Flask request.
+
+    options holds the other request fields (form or JSON, over query args)."""
+    options = req.args.to_dict()
+    mimetype = req.mimetype
+
+    if mimetype == "multipart/form-data":
+        options.update(req.form.to_dict())
+        upload = req.files.get(field)
+        if upload:
+            return upload.read() or None, options
+        value = options.pop(field, None)
+        return (decode_base64(value) if value else None), options
+
+    if mimetype.startswith("image/") or mimetype == "application/octet-stream":
+        # copy into one buffer; get_data() would join chunks into a second copy
+        out = io.BytesIO()
+        shutil.copyfileobj(req.stream, out, BASE64_CHUNK)
+        return out.getvalue() or None, options
+
+    if mimetype == "text/plain":
+        return decode_base64(req.stream) or None, options
+
+    # JSON: parse without caching the raw body, then decode and drop the string
+    try:
+        data = json.loads(req.get_data(cache=False) or b"{}")
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    value = data.pop(field, None)
+    options.update(data)
+    return (decode_base64(value) if value else None), options
+
+
+def option_flag(options, name):
+    """Boolean request option: JSON true, or "1"/"true"/"yes" from a form or query string."""
+    value = options.get(name)
+    return value is True or str(value).strip().lower() in ("1", "true", "yes")
+
+
+# ===================== #
+#   RESPONSES           #
+# ===================== #
+def response_format(req, options, allowed):
+    """Pick one of `allowed` from ?format=/body "format", else the Accept header."""
+    fmt = str(options.get("format", "")).lower()
+    fmt = "jpeg" if fmt == "jpg" else fmt
+    if fmt in allowed:
+        return fmt
+    candidates = [m for m, f in RESPONSE_FORMATS.items() if f in allowed]
+    best = req.accept_mimetypes.best_match(candidates, default="application/json")
+    return RESPONSE_FORMATS.get(best, "json")
+
+
+def to_base64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def multipart_stream(parts, boundary):
+    """Yield a multipart/mixed body for (name, content_type, data) parts as they arrive."""
+    for name, content_type, data in parts:
+        ext = content_type.split("/")[-1]
+        yield (
+            f"--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Disposition: inline; name=\"{name}\"; filename=\"{name}.{ext}\"\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n"
+        ).encode("ascii")
+        yield data
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("ascii")
+
+
+def new_boundary():
+    return f"pose-{uuid.uuid4().hex}"
+
+
+# ===================== #
+#   MEMORY BENCHMARK    #
+# ===================== #
+def _peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+BENCH_CASES = {
+    # case: (content type, how the body is written)
+    "json-before": ("application/json", "json"),
+    "json-after": ("application/json", "json"),
+    "base64-body": ("text/plain", "base64"),
+    "multipart": ("multipart/form-data; boundary=bench", "multipart"),
+    "binary": ("image/png", "raw"),
+}
+
+
+def _write_body(path, kind, mb):
+    """Write a request body for a `mb` MB random "image" without holding it in memory."""
+    block = 3 * 256 * 1024  # multiple of 3, so base64 blocks concatenate cleanly
+    with open(path, "wb") as f:
+        f.write({"json": b'{"image": "', "multipart": b'--bench\r\nContent-Disposition: form-data; '
+                 b'name="image"; filename="image.png"\r\nContent-Type: image/png\r\n\r\n'}.get(kind, b""))
+        written = 0
+        while written < mb * 1024 * 1024:
+            chunk = os.urandom(min(block, mb * 1024 * 1024 - written))
+            f.write(base64.b64encode(chunk) if kind in ("json", "base64") else chunk)
+            written += len(chunk)
+        f.write({"json": b'"}', "multipart": b"\r\n--bench--\r\n"}.get(kind, b""))
+
+
+def _bench_case(case, path, mb):
+    """Run one request/response mode in a fresh process and report its peak RSS."""
+    from flask import Flask, jsonify, request
+
+    app = Flask(__name__)
+    content_type = BENCH_CASES[case][0]
+    with open(path, "rb") as body, app.test_request_context(
+            "/", method="POST", input_stream=body, content_type=content_type,
+            content_length=os.path.getsize(path)):
+        baseline = _peak_rss_mb()
+        if case == "json-before":
+            # what the routes did: get_json() + b64decode + BytesIO, then base64 back into JSON
+            data = request.get_json()
+            decoded = io.BytesIO(base64.b64decode(data["image"])).getvalue()
+            response = jsonify({"result": base64.b64encode(decoded).decode("utf-8")}).get_data()
+        else:
+            decoded, _ = read_image_request(request, "image")
+            # streamed to the socket piece by piece, never joined
+            response = sum(len(piece) for piece in multipart_stream([("result", "image/png", decoded)], new_boundary()))
+        assert len(decoded) == mb * 1024 * 1024
+        del response
+        peak = _peak_rss_mb() - baseline
+    print(f"{case:<12} {mb:>3} MB image: +{peak:.0f} MB peak RSS ({peak / mb:.1f}x the image)")
+
+
+def benchmark(sizes=(8, 32)):
+    import tempfile
+    import subprocess
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mb in sizes:
+            for case, (_, kind) in BENCH_CASES.items():
+                path = os.path.join(tmp, f"{kind}_{mb}.body")
+                if not os.path.exists(path):
+                    _write_body(path, kind, mb)
+                subprocess.run([sys.executable, __file__, case, path, str(mb)], check=True)
+            print()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        _bench_case(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+    else:
+        benchmark()
@@ -3,14 +3,16 @@ import os
 import io
 import time
 import base64
-import tempfile
-import requests
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
-from gtts import gTTS
 from werkzeug.utils import secure_filename
 
+from heygen_jobs import HeyGenJobManager, JobStore, job_response
+from provider_client import get_client, provider_stats
+from tts_cache import cache_from_env
+from tts_stream import audio_stream_response
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -26,6 +28,17 @@ PORT = int(os.getenv("PORT", 5002))
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Background HeyGen job queue; state persisted in data/heygen_jobs.db
+JOBS_DB = os.getenv("HEYGEN_JOBS_DB", os.path.join(os.getcwd(), "data", "heygen_jobs.db"))
+heygen = get_client("heygen")
+gemini = get_client("gemini")
+jobs = HeyGenJobManager(HEYGEN_API_KEY, JobStore(JOBS_DB), status_path="/v2/video/status",
+                        poll_interval=3)
+jobs.resume()  # pick up jobs left pending by a restart
+
+# Content-addressed gTTS audio cache (TTS_CACHE_DIR, TTS_CACHE_MAX_MB)
+tts_cache = cache_from_env(os.path.join(os.getcwd(), "tts_cache"))
+
 # ==========================
 # In-memory / simple store
 # ==========================
@@ -49,10 +62,15 @@ VOICE_MAP = {
 def home():
     return jsonify({"status": "ok", "service": "avatar-backend"})
 
+@app.get("/provider-stats")
+def get_provider_stats():
+    return jsonify({**provider_stats(), "tts_cache": tts_cache.stats()})
+
 # ==========================
 # Preview voice (Page 2)
-# POST { text, voice }
-# returns MP3 audio
+# POST { text, voice, stream? }
+# returns MP3 audio; with stream=true (or ?stream=1) the script is
+# synthesized sentence by sentence and sent with chunked encoding
 # ==========================
 @app.route("/preview-voice", methods=["POST"])
 def preview_voice():
@@ -65,11 +83,11 @@ def preview_voice():
             return jsonify({"error": "No text provided"}), 400
 
         v = VOICE_MAP.get(voice_code, {"lang": "en", "tld": "us"})
-        tts = gTTS(text=text, lang=v["lang"], tld=v["tld"], slow=False)
+        if data.get("stream") or request.args.get("stream") == "1":
+            return audio_stream_response(tts_cache, text, lang=v["lang"], tld=v["tld"])
 
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-        tts.save(tmp.name)
-        return send_file(tmp.name, mimetype="audio/mpeg")
+        audio_path = tts_cache.get(text, lang=v["lang"], tld=v["tld"])
+        return send_file(audio_path, mimetype="audio/mpeg")
 
     except Exception as e:
         app.logger.exception("preview_voice failed")
@@ -103,9 +121,9 @@ def enhance_script():
         if not text:
             return jsonify({"error": "text required"}), 400
 
-        url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateText"
+        url = "/v1beta/models/gemini-pro:generateText"
         payload = {"prompt": f"Rewrite and enhance this ad script professionally:\n\n{text}"}
-        resp = requests.post(f"{url}?key={GEMINI_API_KEY}", json=payload, timeout=30)
+        resp = gemini.post(url, params={"key": GEMINI_API_KEY}, json=payload, timeout=30)
         resp.raise_for_status()
         result = resp.json()
         enhanced = result.get("candidates", [{}])[0].get("output_text")
@@ -124,7 +142,8 @@ def enhance_script():
 #   - Ensure SELECTED_VOICE exists
 #   - Generate TTS audio with gTTS according to selected voice
 #   - Convert audio to base64 and send to HeyGen's generation endpoint
-#   - Poll HeyGen status until done or timeout; return final video URL
+#   - Queue the HeyGen job and return its job_id right away (202);
+#     poll GET /video-status?job_id=... for the final video URL
 # ==========================
 @app.route("/generate-heygen-video", methods=["POST"])
 def generate_heygen_video():
@@ -166,11 +185,9 @@ def generate_heygen_video():
 
         # 1) Generate TTS audio using the previously selected voice
         voice_spec = VOICE_MAP.get(SELECTED_VOICE, {"lang": "en", "tld": "us"})
-        tts = gTTS(text=text, lang=voice_spec["lang"], tld=voice_spec["tld"], slow=False)
-        audio_tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-        tts.save(audio_tmp.name)
+        audio_path = tts_cache.get(text, lang=voice_spec["lang"], tld=voice_spec["tld"])
 
-        with open(audio_tmp.name, "rb") as f:
+        with open(audio_path, "rb") as f:
             audio_b64 = base64.b64encode(f.read()).decode("utf-8")
 
         # 2) Construct HeyGen payload
@@ -192,70 +209,34 @@ def generate_heygen_video():
             ]
         }
 
-        headers = {"X-Api-Key": HEYGEN_API_KEY, "Content-Type": "application/json"}
-        gen_resp = requests.post("https://api.heygen.com/v2/video/generate", json=heygen_payload, headers=headers, timeout=60)
-        # If HeyGen returns non-JSON or an error body, raise
-        try:
-            gen_json = gen_resp.json()
-        except Exception:
-            return jsonify({"error": "HeyGen returned non-JSON", "status": gen_resp.status_code, "text": gen_resp.text}), 500
-
-        # Check expected structure; adapt if your HeyGen account uses different response fields
-        if gen_resp.status_code not in (200, 201) or "data" not in gen_json:
-            return jsonify({"error": "HeyGen generation failed", "details": gen_json}), 500
-
-        video_id = gen_json["data"].get("video_id") or gen_json["data"].get("id")
-        if not video_id:
-            # return raw for debugging
-            return jsonify({"error": "HeyGen did not return video_id", "details": gen_json}), 500
-
-        # 3) Poll HeyGen status for completion (simple loop with timeout)
-        status_url = "https://api.heygen.com/v2/video/status"
-        final_video_url = None
-        timeout_seconds = 120
-        poll_interval = 3
-        start = time.time()
-
-        while time.time() - start < timeout_seconds:
-            status_resp = requests.get(status_url, params={"video_id": video_id}, headers=headers, timeout=20)
-            try:
-                status_json = status_resp.json()
-            except Exception:
-                time.sleep(poll_interval)
-                continue
-
-            # HeyGen status field might be 'status' or nested; adapt as needed
-            status_field = status_json.get("data", {}).get("status") or status_json.get("status")
-            if status_field in ("completed", "done", "finished"):
-                final_video_url = status_json.get("data", {}).get("result_url") or status_json.get("result_url")
-                break
-            elif status_field in ("failed", "error"):
-                return jsonify({"error": "HeyGen job failed", "details": status_json}), 500
-
-            time.sleep(poll_interval)
-
-        if not final_video_url:
-            # return video_id so frontend can poll longer if needed
-            return jsonify({"message": "processing", "video_id": video_id}), 202
-
-        return jsonify({"success": True, "video_url": final_video_url})
+        # 3) Queue the job; submission and status polling happen on the background poller
+        job_id = jobs.enqueue(heygen_payload)
+        return jsonify({"message": "queued", "job_id": job_id, "status": "queued"}), 202
 
     except Exception as e:
         app.logger.exception("generate_heygen_video failed")
         return jsonify({"error": str(e)}), 500
 
 # ==========================
-# Optional: expose video status check for frontend polling
-# GET /video-status?video_id=...
+# Video status check for frontend polling
+# GET /video-status?job_id=...  (or ?video_id=...)
 # ==========================
 @app.route("/video-status", methods=["GET"])
 def video_status():
+    job_id = request.args.get("job_id")
     video_id = request.args.get("video_id")
-    if not video_id:
-        return jsonify({"error": "video_id required"}), 400
+    if not job_id and not video_id:
+        return jsonify({"error": "job_id or video_id required"}), 400
+
+    job = jobs.get(job_id=job_id, video_id=video_id)
+    if job:
+        return jsonify(job_response(job))
+    if job_id:
+        return jsonify({"error": "Unknown job_id"}), 404
+
+    # not one of ours; fall back to asking HeyGen directly
     headers = {"X-Api-Key": HEYGEN_API_KEY}
-    status_url = "https://api.heygen.com/v2/video/status"
-    resp = requests.get(status_url, params={"video_id": video_id}, headers=headers, timeout=20)
+    resp = heygen.get("/v2/video/status", params={"video_id": video_id}, headers=headers, timeout=20)
     try:
         return jsonify(resp.json())
     except Exception:
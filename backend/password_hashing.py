@@ -0,0 +1,274 @@
+# backend/password_hashing.py
+# bcrypt hashing/verification off the Flask request thread.
+#
+# A bcrypt call burns tens to hundreds of ms of CPU, so a login burst that runs
+# it inline on every request thread starves every other route in the process.
+# Hashes run on a small dedicated thread pool instead (bcrypt releases the GIL,
+# so the pool hashes in parallel while the rest of the app keeps its share of
+# the CPU), and admission is bounded: at most `workers + queue_limit` hashes
+# are in flight. Past that, calls raise HasherBusy with a Retry-After estimate
+# and the route answers 503.
+#
+# The work factor is BCRYPT_ROUNDS. Hashes made with a different cost still
+# verify (the cost is stored in the hash); needs_rehash() tells the login
+# route to re-hash the password at the current cost in the background.
+#
+#   python password_hashing.py    # cost per round count, and a login burst
+#                                 # inline vs. on the pool
+import os
+import math
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+log = logging.getLogger(__name__)
+
+# bcrypt only looks at the first 72 bytes; bcrypt >= 5 raises instead of
+# truncating, so truncate explicitly to keep existing hashes verifying
+MAX_PASSWORD_BYTES = 72
+
+
+def _password_bytes(password):
+    return password.encode("utf-8")[:MAX_PASSWORD_BYTES]
+
+
+def hash_rounds(hashed):
+    """Cost factor stored in a bcrypt hash ("$2b$12$..." -> 12), or None."""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class HasherBusy(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"password hashing queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    def __init__(self, workers=2, queue_limit=16, rounds=12, timeout=30):
+        self.workers = workers
+        self.capacity = workers + queue_limit
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.hashes = 0
+        self.verifies = 0
+        self.rehashes = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._avg_hash = None  # EWMA of bcrypt time alone
+        self._avg_total = None  # EWMA of submit-to-result time, queue wait included
+
+    def retry_after(self):
+        # a full queue drains in about capacity / workers hash times
+        per_hash = self._avg_hash or 0.25
+        return max(1, math.ceil(per_hash * self.capacity / self.workers))
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        return result, time.perf_counter() - started
+
+    def _submit(self, fn, *args, optional=False):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                if optional:
+                    return None
+                self.rejected += 1
+                raise HasherBusy(self.retry_after())
+            self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            future = self._executor.submit(self._timed, fn, *args)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(lambda f: self._finished(f, started))
+        return future
+
+    def _result(self, future):
+        # waited `timeout` in the queue: same answer as a full queue (503 + Retry-After),
+        # and a job that has not started yet is dropped
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise HasherBusy(self.retry_after()) from None
+
+    def _finished(self, future, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+                return
+            hash_seconds = future.result()[1]
+            self._avg_hash = hash_seconds if self._avg_hash is None else 0.8 * self._avg_hash + 0.2 * hash_seconds
+            self._avg_total = elapsed if self._avg_total is None else 0.8 * self._avg_total + 0.2 * elapsed
+
+    def _hash(self, password):
+        return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(self.rounds)).decode("utf-8")
+
+    @staticmethod
+    def _check(password, hashed):
+        try:
+            return bcrypt.checkpw(_password_bytes(password), hashed.encode("utf-8"))
+        except ValueError:
+            # malformed stored hash
+            return False
+
+    def hash(self, password):
+        """bcrypt hash (str) at the current cost; returns (hash, seconds spent hashing)."""
+        result, seconds = self._result(self._submit(self._hash, password))
+        with self._lock:
+            self.hashes += 1
+        return result, seconds
+
+    def verify(self, password, hashed):
+        """Returns (matches, seconds spent hashing). Raises HasherBusy when saturated
+        or when the result takes longer than `timeout`."""
+        if not password or not hashed:
+            return False, 0.0
+        result, seconds = self._result(self._submit(self._check, password, hashed))
+        with self._lock:
+            self.verifies += 1
+        return result, seconds
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def rehash_later(self, password, save):
+        """Re-hash at the current cost in the background and call save(new_hash).
+
+        Best effort: skipped when the pool is busy, so it never delays logins."""
+        future = self._submit(self._hash, password, optional=True)
+        if future is None:
+            return False
+
+        def done(f):
+            if f.cancelled() or f.exception() is not None:
+                return
+            try:
+                save(f.result()[0])
+                with self._lock:
+                    self.rehashes += 1
+            except Exception as e:
+                log.warning("could not store re-hashed password: %s", e)
+
+        future.add_done_callback(done)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "rounds": self.rounds,
+                "in_flight": self._in_flight,
+                "hashes": self.hashes,
+                "verifies": self.verifies,
+                "rehashes": self.rehashes,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_hash_ms": round(self._avg_hash * 1000, 1) if self._avg_hash else None,
+                "avg_total_ms": round(self._avg_total * 1000, 1) if self._avg_total else None,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def hasher_from_env():
+    cpus = os.cpu_count() or 1
+    workers = int(os.getenv("BCRYPT_WORKERS", max(1, cpus // 2)))
+    return PasswordHasher(
+        workers=workers,
+        queue_limit=int(os.getenv("BCRYPT_QUEUE_LIMIT", workers * 8)),
+        rounds=int(os.getenv("BCRYPT_ROUNDS", 12)),
+        timeout=float(os.getenv("BCRYPT_TIMEOUT", 30)),
+    )
+
+
+# ===================== #
+#   LOGIN BURST BENCH   #
+# ===================== #
+def _light_request():
+    # stands in for a cheap route (profile read, health check)
+    return sum(i * i for i in range(20_000))
+
+
+def _percentile(times, q):
+    times = sorted(times)
+    return times[min(len(times) - 1, int(len(times) * q))] * 1000
+
+
+def benchmark(rounds=(10, 11, 12, 13), burst=64, light=200):
+    print("bcrypt cost per hash:")
+    for r in rounds:
+        salt = bcrypt.gensalt(r)
+        t = time.perf_counter()
+        bcrypt.hashpw(b"correct horse battery staple", salt)
+        print(f"  rounds {r:>2}: {(time.perf_counter() - t) * 1000:7.1f} ms")
+
+    cpus = os.cpu_count() or 1
+    hasher = hasher_from_env()
+    stored = bcrypt.hashpw(b"hunter2", bcrypt.gensalt(hasher.rounds)).decode()
+    _light_request()
+
+    def light_latencies(stop):
+        times = []
+        while not stop.is_set() and len(times) < light:
+            t = time.perf_counter()
+            _light_request()
+            times.append(time.perf_counter() - t)
+        return times
+
+    def run(label, login):
+        stop = threading.Event()
+        with ThreadPoolExecutor(burst + 1) as pool:
+            probe = pool.submit(light_latencies, stop)
+            t = time.perf_counter()
+            logins = [pool.submit(login) for _ in range(burst)]
+            outcomes = [f.result() for f in logins]
+            elapsed = time.perf_counter() - t
+            stop.set()
+            times = probe.result()
+        served = sum(1 for ok in outcomes if ok)
+        print(f"  {label:<26} {served:>3}/{burst} logins in {elapsed:5.2f}s   "
+              f"light route p50 {_percentile(times, 0.5):6.1f} ms  p99 {_percentile(times, 0.99):6.1f} ms")
+
+    print(f"\n{burst} concurrent logins at rounds {hasher.rounds}, {cpus} CPUs, "
+          f"while a light route keeps serving:")
+    t = time.perf_counter()
+    for _ in range(light):
+        _light_request()
+    print(f"  {'idle':<26} light route mean {(time.perf_counter() - t) * 1000 / light:6.1f} ms")
+
+    run("inline (one per thread)", lambda: bcrypt.checkpw(b"hunter2", stored.encode()))
+
+    def pooled():
+        try:
+            return hasher.verify("hunter2", stored)[0]
+        except HasherBusy:
+            return False  # 503 + Retry-After
+
+    run(f"pool ({hasher.workers} workers, cap {hasher.capacity})", pooled)
+    print(f"  pool stats: {hasher.stats()}")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    benchmark()
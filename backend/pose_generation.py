@@ -0,0 +1,147 @@
+# backend/pose_generation.py
+# Concurrent avatar pose generation for /api/ai/generate.
+#
+# Each pose is its own pipeline: remote image generation -> background removal
+# (rembg pool, via the cut-out cache) -> paste the product -> encoded image.
+# All poses run at once on a shared thread pool, so a pose's background
+# removal starts as soon as its image arrives instead of after every
+# generation has finished, and results are yielded in completion order for
+# streaming.
+#
+# The image model is loaded once (lazily, thread-safe) and reused by every
+# request; Vertex AI is only imported and initialised then, so the server
+# boots without GCP config and /api/ai/generate answers 503 until it is set.
+# IMAGE_MODEL=fake swaps in FakeImageModel for offline runs.
+import io
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from bg_removal import PoolSaturated
+from image_encoding import EncodeOptions, encode_variants
+
+IMAGE_MODEL_NAME = os.getenv("IMAGE_MODEL_NAME", "google/cog-image-alpha")
+POSE_WORKERS = int(os.getenv("POSE_GENERATION_WORKERS", 8))
+# a request's poses share the rembg pool, so they queue for a slot (up to this
+# long) instead of being rejected by their own siblings on a small pool
+POSE_REMBG_WAIT = float(os.getenv("POSE_REMBG_WAIT_SECONDS", 60))
+
+
+class PoseError(Exception):
+    """A pose failed; `status` is the HTTP status the route should use."""
+
+    def __init__(self, message, status=500, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class FakeImageModel:
+    """Stand-in for ImageGenerationModel: a flat image after `latency` seconds."""
+
+    def __init__(self, latency=float(os.getenv("FAKE_IMAGE_MODEL_MS", 500)) / 1000, size=1024):
+        self.latency = latency
+        self.size = size
+        self.calls = 0
+
+    def predict(self, prompt, **kwargs):
+        from PIL import Image
+
+        self.calls += 1
+        time.sleep(self.latency)
+        shade = sum(prompt.encode()) % 200
+        image = Image.new("RGB", (self.size, self.size), (shade, 255 - shade, 128))
+        return type("FakeResponse", (), {"images": [image]})()
+
+
+class ModelUnavailable(RuntimeError):
+    pass
+
+
+def load_vertex_model():
+    project = os.getenv("GCP_PROJECT_ID")
+    if not project:
+        raise ModelUnavailable("Missing GCP_PROJECT_ID in .env file.")
+    from google.cloud import aiplatform
+    aiplatform.init(project=project, location=os.getenv("GCP_REGION", "us-central1"))
+    return aiplatform.ImageGenerationModel.from_pretrained(IMAGE_MODEL_NAME)
+
+
+def load_image_model():
+    if os.getenv("IMAGE_MODEL", "vertex").lower() == "fake":
+        return FakeImageModel()
+    return load_vertex_model()
+
+
+class PoseGenerator:
+    def __init__(self, remover, load_model=load_image_model, max_workers=POSE_WORKERS, rembg_wait=POSE_REMBG_WAIT):
+        self.remover = remover  # RembgPool or CutoutCache: .remove(png_bytes, wait=seconds) -> png_bytes
+        self.load_model = load_model
+        self.rembg_wait = rembg_wait
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pose")
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self.load_model()
+        return self._model
+
+    def _pose(self, prompt, product_image, encode_opts):
+        from PIL import Image
+
+        try:
+            model = self.model
+        except ModelUnavailable as e:
+            raise PoseError(f"Image generation is not configured: {e}", status=503)
+        except Exception as e:
+            raise PoseError(f"Image model failed to load: {e}", status=503)
+
+        try:
+            response = model.predict(
+                prompt=prompt,
+                max_output_tokens=256,
+                image_dimensions=(1024, 1024)
+            )
+            model_image = response.images[0].convert("RGBA")
+        except Exception as e:
+            raise PoseError(f"Gemini generation failed: {str(e)}")
+
+        buf = io.BytesIO()
+        model_image.save(buf, format="PNG")
+        try:
+            no_bg_png = self.remover.remove(buf.getvalue(), wait=self.rembg_wait)
+        except PoolSaturated as e:
+            raise PoseError("Background removal is busy, please retry", status=503, retry_after=e.retry_after)
+
+        model_no_bg = Image.open(io.BytesIO(no_bg_png))
+        model_no_bg.paste(product_image, (100, 500), product_image)
+        return encode_variants(model_no_bg, encode_opts)
+
+    def generate(self, product_image, prompts, encode_opts=None):
+        """Yield (pose_name, encoded, error) as each pose finishes.
+
+        encoded is image_encoding.encode_variants() output; error is a PoseError or None."""
+        encode_opts = encode_opts or EncodeOptions()
+        futures = {self._executor.submit(self._pose, prompt, product_image, encode_opts): name
+                   for name, prompt in prompts.items()}
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except PoseError as e:
+                    yield futures[future], None, e
+                except Exception as e:
+                    yield futures[future], None, PoseError(str(e))
+        finally:
+            # client went away or the caller stopped early: drop poses not yet started
+            for future in futures:
+                future.cancel()
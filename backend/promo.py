@@ -2,12 +2,15 @@
 import os
 import time
 import json
-import requests
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 
+from catalog_cache import CatalogCache, filter_items, paginate, parse_bool, query_etag
+from heygen_jobs import HeyGenJobManager, JobStore, job_response
+from provider_client import get_client, provider_stats
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -26,6 +29,12 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 if not HEYGEN_API_KEY:
     app.logger.warning("HEYGEN_API_KEY not set!")
 
+# Background HeyGen job queue (state persisted in data/promo_jobs.db)
+JOBS_DB = os.getenv("HEYGEN_JOBS_DB", os.path.join(os.getcwd(), "data", "promo_jobs.db"))
+heygen = get_client("heygen")
+jobs = HeyGenJobManager(HEYGEN_API_KEY, JobStore(JOBS_DB), status_path="/v2/video/get-status")
+jobs.resume()  # pick up jobs left pending by a restart
+
 # In-memory state
 SELECTED_VOICE = None
 SELECTED_AVATAR = None
@@ -34,28 +43,85 @@ SELECTED_AVATAR = None
 def home():
     return jsonify({"status": "ok", "service": "heygen-backend-v3-final"})
 
-# ── LIST AVATARS & VOICES (unchanged, working) ─────────────────────────────────
+@app.get("/provider-stats")
+def get_provider_stats():
+    return jsonify({**provider_stats(),
+                    "catalog": {"avatars": avatar_catalog.stats(), "voices": voice_catalog.stats()}})
+
+# ── LIST AVATARS & VOICES (cached) ────────────────────────────────────────────
+# Catalogs are cached in-process and refreshed in the background, so page
+# loads never wait on HeyGen once warm. Optional query params:
+#   gender, language (voices), is_public (avatars), page, page_size
+# Responses carry an ETag; a matching If-None-Match gets 304.
+def fetch_avatars():
+    resp = heygen.get("/v2/avatars",
+                      headers={"X-Api-Key": HEYGEN_API_KEY}, timeout=30)
+    resp.raise_for_status()
+    avatars = resp.json().get("data", {}).get("avatars", [])
+    return [{
+        "id": a.get("avatar_id"),
+        "name": a.get("avatar_name"),
+        "preview_image": a.get("preview_image_url"),
+        "preview_video": a.get("preview_video_url"),
+        "gender": a.get("gender"),
+        "is_public": a.get("is_public", False)
+    } for a in avatars]
+
+def fetch_voices():
+    resp = heygen.get("/v2/voices",
+                      headers={"X-Api-Key": HEYGEN_API_KEY}, timeout=30)
+    resp.raise_for_status()
+    voices = resp.json().get("data", {}).get("voices", [])
+    return [{
+        "id": v.get("voice_id"),
+        "name": v.get("display_name") or v.get("name"),
+        "gender": v.get("gender"),
+        "language": v.get("language"),
+        "preview_audio": v.get("preview_audio_url")
+    } for v in voices]
+
+CATALOG_TTL = int(os.getenv("CATALOG_TTL", 300))
+avatar_catalog = CatalogCache("avatars", fetch_avatars, ttl=CATALOG_TTL)
+voice_catalog = CatalogCache("voices", fetch_voices, ttl=CATALOG_TTL)
+
+# Filters each catalog's items actually carry (fetch_avatars / fetch_voices)
+AVATAR_FILTERS = ("gender", "is_public")
+VOICE_FILTERS = ("gender", "language")
+
+def catalog_response(cache, key, filters):
+    for k in ("gender", "language", "is_public"):
+        if k in request.args and k not in filters:
+            return jsonify({"error": f"{k} is not a filter for {key}; use {', '.join(filters)}"}), 400
+    args = {k: v for k, v in request.args.items() if k in filters + ("page", "page_size")}
+    for k in ("page", "page_size"):
+        if k in args and not args[k].isdigit():
+            return jsonify({"error": f"{k} must be a positive integer"}), 400
+
+    items, version = cache.get()
+    etag = query_etag(version, args)
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    else:
+        selected = filter_items(items,
+                                gender=args.get("gender"),
+                                language=args.get("language"),
+                                is_public=parse_bool(args.get("is_public")))
+        page_items, page_info = paginate(selected, args.get("page"), args.get("page_size"))
+        body = {key: page_items, "total": len(selected)}
+        if page_info:
+            body.update(page_info)
+        resp = jsonify(body)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
 @app.route("/list-avatars", methods=["GET", "OPTIONS"])
 def list_avatars():
     if request.method == "OPTIONS": return "", 204
     if not HEYGEN_API_KEY: return jsonify({"error": "No API key"}), 500
 
     try:
-        resp = requests.get("https://api.heygen.com/v2/avatars",
-                          headers={"X-Api-Key": HEYGEN_API_KEY}, timeout=30)
-        resp.raise_for_status()
-        avatars = resp.json().get("data", {}).get("avatars", [])
-
-        formatted = [{
-            "id": a.get("avatar_id"),
-            "name": a.get("avatar_name"),
-            "preview_image": a.get("preview_image_url"),
-            "preview_video": a.get("preview_video_url"),
-            "gender": a.get("gender"),
-            "is_public": a.get("is_public", False)
-        } for a in avatars]
-
-        return jsonify({"avatars": formatted})
+        return catalog_response(avatar_catalog, "avatars", AVATAR_FILTERS)
     except Exception as e:
         app.logger.exception("list_avatars")
         return jsonify({"error": str(e)}), 500
@@ -66,20 +132,7 @@ def list_voices():
     if not HEYGEN_API_KEY: return jsonify({"error": "No API key"}), 500
 
     try:
-        resp = requests.get("https://api.heygen.com/v2/voices",
-                          headers={"X-Api-Key": HEYGEN_API_KEY}, timeout=30)
-        resp.raise_for_status()
-        voices = resp.json().get("data", {}).get("voices", [])
-
-        formatted = [{
-            "id": v.get("voice_id"),
-            "name": v.get("display_name") or v.get("name"),
-            "gender": v.get("gender"),
-            "language": v.get("language"),
-            "preview_audio": v.get("preview_audio_url")
-        } for v in voices]
-
-        return jsonify({"voices": formatted})
+        return catalog_response(voice_catalog, "voices", VOICE_FILTERS)
     except Exception as e:
         app.logger.exception("list_voices")
         return jsonify({"error": str(e)}), 500
@@ -122,8 +175,8 @@ def upload_background():
 
     try:
         with open(temp_path, "rb") as f:
-            resp = requests.post(
-                "https://api.heygen.com/v1/background/upload",
+            resp = heygen.post(
+                "/v1/background/upload",
                 headers={"X-Api-Key": HEYGEN_API_KEY},
                 files={"file": f},
                 timeout=60
@@ -203,46 +256,9 @@ def generate_heygen_video():
             "aspect_ratio": "16:9"
         }
 
-        headers = {
-            "X-Api-Key": HEYGEN_API_KEY,
-            "Content-Type": "application/json"
-        }
-
-        # Submit job
-        resp = requests.post(
-            "https://api.heygen.com/v2/video/generate",
-            json=payload,
-            headers=headers,
-            timeout=60
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        video_id = data.get("data", {}).get("video_id")
-
-        if not video_id:
-            return jsonify({"error": "No video_id returned", "details": data}), 500
-
-        # Poll for result
-        for _ in range(60):  # ~5 minutes
-            time.sleep(5)
-            status_resp = requests.get(
-                "https://api.heygen.com/v2/video/get-status",
-                params={"video_id": video_id},
-                headers=headers,
-                timeout=20
-            )
-            status_resp.raise_for_status()
-            status_data = status_resp.json().get("data", {})
-            status = status_data.get("status", "").lower()
-
-            if status in ("completed", "succeeded"):
-                video_url = status_data.get("video_url")
-                if video_url:
-                    return jsonify({"success": True, "video_url": video_url})
-            elif status in ("failed", "error"):
-                return jsonify({"error": "Generation failed", "details": status_data}), 500
-
-        return jsonify({"message": "processing", "video_id": video_id}), 202
+        # Hand off to the background poller; the client polls /video-status
+        job_id = jobs.enqueue(payload)
+        return jsonify({"message": "queued", "job_id": job_id, "status": "queued"}), 202
 
     except Exception as e:
         app.logger.exception("generate_heygen_video")
@@ -252,12 +268,21 @@ def generate_heygen_video():
 @app.route("/video-status", methods=["GET", "OPTIONS"])
 def video_status():
     if request.method == "OPTIONS": return "", 204
+    job_id = request.args.get("job_id")
     video_id = request.args.get("video_id")
-    if not video_id: return jsonify({"error": "video_id required"}), 400
+    if not job_id and not video_id:
+        return jsonify({"error": "job_id or video_id required"}), 400
+
+    job = jobs.get(job_id=job_id, video_id=video_id)
+    if job:
+        return jsonify(job_response(job))
+    if job_id:
+        return jsonify({"error": "Unknown job_id"}), 404
 
+    # Video not created through the job queue; ask HeyGen directly
     try:
-        resp = requests.get(
-            "https://api.heygen.com/v2/video/get-status",
+        resp = heygen.get(
+            "/v2/video/get-status",
             params={"video_id": video_id},
             headers={"X-Api-Key": HEYGEN_API_KEY},
             timeout=20
@@ -0,0 +1,187 @@
+# backend/provider_client.py
+# Shared HTTP layer for every outbound provider call (HeyGen, D-ID, Gemini).
+#
+# One keep-alive requests.Session per provider so repeated calls and polling
+# loops reuse pooled TCP/TLS connections instead of handshaking each time.
+# Requests are retried with exponential backoff on 429/5xx, and per-provider
+# latency/error counters are kept for /provider-stats.
+#
+# Pool sizes, retries and base URLs are configurable from the environment,
+# e.g. HEYGEN_API_BASE=http://localhost:5055 HEYGEN_POOL_SIZE=32 to run
+# against the local stub in fake_heygen.py.
+import os
+import time
+import random
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+PROVIDER_BASE_URLS = {
+    "heygen": os.getenv("HEYGEN_API_BASE", "https://api.heygen.com"),
+    "did": os.getenv("D_ID_API_BASE", "https://api.d-id.com"),
+    "gemini": os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com"),
+}
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+def _env_int(name, provider, default):
+    return int(os.getenv(f"{provider.upper()}_{name}", os.getenv(f"PROVIDER_{name}", default)))
+
+
+def _env_float(name, provider, default):
+    return float(os.getenv(f"{provider.upper()}_{name}", os.getenv(f"PROVIDER_{name}", default)))
+
+
+class ProviderStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.status_counts = {}
+
+    def record(self, latency, status=None, error=False):
+        with self._lock:
+            self.requests += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if error:
+                self.errors += 1
+            key = str(status) if status is not None else "exception"
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "avg_latency_ms": round(1000 * self.total_latency / self.requests, 2) if self.requests else 0.0,
+                "max_latency_ms": round(1000 * self.max_latency, 2),
+                "status_counts": dict(self.status_counts),
+            }
+
+
+class ProviderClient:
+    """Pooled, retrying HTTP client bound to one provider's base URL."""
+
+    def __init__(self, name, base_url, pool_size=10, retries=3, backoff=0.5,
+                 timeout=30, max_backoff=10.0):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.stats = ProviderStats()
+
+        self.session = requests.Session()
+        # Retries are handled in request() so every attempt is counted
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path):
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _delay(self, attempt, resp=None):
+        if resp is not None:
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        delay = self.backoff * (2 ** attempt)
+        return min(delay + random.uniform(0, delay / 2), self.max_backoff)
+
+    def request(self, method, path, **kwargs):
+        method = method.upper()
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+        # Non-idempotent calls (e.g. submitting a video) are only retried when
+        # the request never reached the provider: 429 or a connect timeout.
+        retry_statuses = RETRY_STATUSES if method in IDEMPOTENT_METHODS else (429,)
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                self.stats.record(time.perf_counter() - start, error=True)
+                if method in IDEMPOTENT_METHODS:
+                    retryable = isinstance(e, (requests.ConnectionError, requests.Timeout))
+                else:
+                    retryable = isinstance(e, requests.ConnectTimeout)
+                if not retryable or attempt >= self.retries:
+                    raise
+                self._sleep_before_retry(attempt, files=kwargs.get("files"))
+                attempt += 1
+                continue
+
+            self.stats.record(time.perf_counter() - start, resp.status_code,
+                              error=resp.status_code >= 500 or resp.status_code == 429)
+            if resp.status_code in retry_statuses and attempt < self.retries:
+                self._sleep_before_retry(attempt, resp, kwargs.get("files"))
+                resp.close()
+                attempt += 1
+                continue
+            return resp
+
+    def _sleep_before_retry(self, attempt, resp=None, files=None):
+        self.stats.record_retry()
+        delay = self._delay(attempt, resp)
+        log.debug("%s: retry %d in %.2fs", self.name, attempt + 1, delay)
+        time.sleep(delay)
+        # uploads are streamed from file objects; rewind them for the next attempt
+        for f in (files or {}).values():
+            f = f[1] if isinstance(f, tuple) else f
+            if hasattr(f, "seek"):
+                f.seek(0)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+
+# ==========================
+# Process-wide registry
+# ==========================
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name):
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = ProviderClient(
+                name,
+                PROVIDER_BASE_URLS[name],
+                pool_size=_env_int("POOL_SIZE", name, 10),
+                retries=_env_int("RETRIES", name, 3),
+                backoff=_env_float("BACKOFF", name, 0.5),
+                timeout=_env_float("TIMEOUT", name, 30),
+            )
+            _clients[name] = client
+        return client
+
+
+def provider_stats():
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {c.name: c.stats.snapshot() for c in clients}
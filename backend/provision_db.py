@@ -0,0 +1,47 @@
+# backend/provision_db.py
+# One-off MongoDB maintenance for the auth/profile routes: create the users
+# and drafts indexes and move legacy embedded `drafts` arrays into the drafts
+# collection.
+#
+# avatar_server runs provision() in a background thread on every boot (the
+# db_setup job), so a plain deploy gets the unique email index and the drafts
+# index without an extra step. Every step is idempotent: index builds are
+# no-ops when the indexes exist and the migration only touches users that
+# still carry an embedded `drafts` array, so concurrent workers are safe.
+# Running it by hand is still useful to migrate before a rollout.
+#
+#   python provision_db.py    # uses ATLAS_URI from the environment / .env
+import os
+import time
+import logging
+
+from draft_store import DraftStore
+from user_store import ensure_indexes, mongo_client_from_env
+
+log = logging.getLogger(__name__)
+
+DATABASE = "fashion_ai"
+
+
+def provision(db):
+    """Indexes + drafts migration; returns a summary dict. Safe to re-run."""
+    started = time.perf_counter()
+    users_indexed = ensure_indexes(db["users"])  # unique email index: indexed logins, race-free register
+    drafts = DraftStore(db["drafts"])
+    drafts_indexed = drafts.ensure_indexes()
+    moved = drafts.migrate_embedded(db["users"])
+    return {
+        "users_indexes": users_indexed,
+        "drafts_indexes": drafts_indexed,
+        "drafts_migrated": moved,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    client = mongo_client_from_env(os.getenv("ATLAS_URI"))
+    print(provision(client[DATABASE]))
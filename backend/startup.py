@@ -0,0 +1,151 @@
+# backend/startup.py
+# Startup bookkeeping for avatar_server.py: feature sets, lazily-loaded
+# subsystems, optional background pre-warm and a per-subsystem timing report.
+#
+# Heavy stacks (pymongo/bson and the Mongo client, Pillow, the rembg worker
+# pool, the Vertex image model, the avatar images) are built on first use, so
+# a worker process boots in well under a second and the auth and health
+# routes never pay for the image/AI stacks.
+#
+# SERVER_FEATURES picks which route groups are served (default: all of
+#   auth,media,ai); e.g. SERVER_FEATURES=auth boots only auth/profile/drafts.
+# STARTUP_PREWARM=1 (or a list of subsystem names) builds the lazy
+#   subsystems of the enabled features in a background thread after boot.
+#
+# Each boot phase and lazy load is timed; the report is logged once the
+# module has loaded and served under "startup" on /provider-stats.
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+ALL_FEATURES = ("auth", "media", "ai")
+
+
+def features_from_env():
+    raw = os.getenv("SERVER_FEATURES", "").strip().lower()
+    if not raw or raw == "all":
+        return set(ALL_FEATURES)
+    features = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = features - set(ALL_FEATURES)
+    if unknown:
+        raise ValueError(f"unknown SERVER_FEATURES: {', '.join(sorted(unknown))} "
+                         f"(choose from {', '.join(ALL_FEATURES)})")
+    return features
+
+
+class Lazy:
+    """A subsystem built on first get() (thread-safe, once), and timed.
+
+    A failed build is not cached: the error propagates and the next get() retries."""
+
+    def __init__(self, name, factory, report):
+        self.name = name
+        self.factory = factory
+        self.report = report
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                self._value = self.report.timed(self.name, self.factory)()
+                self._loaded = True
+        return self._value
+
+
+class StartupReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.booted = None
+        self._lock = threading.Lock()
+        self.phases = {}  # name -> {"seconds", "when": "boot" | "lazy" | "prewarm", "error"?}
+
+    def record(self, name, seconds, when="boot", error=None):
+        entry = {"seconds": round(seconds, 4), "when": when}
+        if error is not None:
+            entry["error"] = str(error)
+        with self._lock:
+            self.phases[name] = entry
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def timed(self, name, fn):
+        """Wrap fn so each call is recorded as a lazy load of `name`."""
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self.record(name, time.perf_counter() - started, "lazy", error=e)
+                raise
+            self.record(name, time.perf_counter() - started, "lazy")
+            return result
+        return wrapper
+
+    def boot_complete(self):
+        self.booted = time.perf_counter() - self.started
+        log.info(self.summary())
+        return self.booted
+
+    def summary(self):
+        with self._lock:
+            boot = [(name, p["seconds"]) for name, p in self.phases.items() if p["when"] == "boot"]
+        return f"booted in {self.booted * 1000:.0f} ms (" + ", ".join(
+            f"{name} {seconds * 1000:.0f} ms" for name, seconds in boot) + ")"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "boot_seconds": round(self.booted, 4) if self.booted is not None else None,
+                "phases": {name: dict(p) for name, p in self.phases.items()},
+            }
+
+
+def prewarm(subsystems, report):
+    """Build the given subsystems ({name: callable}) one after another in a
+    background thread, timing each; returns the thread (or None)."""
+    if not subsystems:
+        return None
+
+    def run():
+        for name, warm in subsystems.items():
+            started = time.perf_counter()
+            try:
+                warm()
+                report.record(name, time.perf_counter() - started, "prewarm")
+            except Exception as e:
+                report.record(name, time.perf_counter() - started, "prewarm", error=e)
+                log.warning("pre-warm of %s failed: %s", name, e)
+
+    thread = threading.Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def prewarm_from_env(available):
+    """The subset of `available` ({name: callable}) named by STARTUP_PREWARM
+    ("1"/"all" for all of them, or a comma-separated list of names)."""
+    raw = os.getenv("STARTUP_PREWARM", "").strip().lower()
+    if raw in ("", "0", "false", "no", "none"):
+        return {}
+    if raw in ("1", "true", "yes", "all"):
+        return dict(available)
+    names = {name.strip() for name in raw.split(",") if name.strip()}
+    return {name: warm for name, warm in available.items() if name in names}
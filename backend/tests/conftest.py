@@ -0,0 +1,34 @@
+# backend modules import each other flat (`from bg_removal import ...`), as
+# when the server is started from backend/
+import os
+import sys
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _YieldingLock:
+    """threading.Lock that gives up the CPU after every release, so the other
+    threads get to run in each gap between two critical sections."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+
+    def __exit__(self, *exc):
+        self._lock.release()
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def yielding_locks(monkeypatch):
+    """Make the locks a module creates (threading.Lock()) yield on release."""
+    def patch(module):
+        monkeypatch.setattr(module, "threading", SimpleNamespace(Lock=_YieldingLock))
+    return patch
@@ -0,0 +1,44 @@
+import time
+import threading
+
+import cutout_cache
+from cutout_cache import CutoutCache
+
+
+def test_concurrent_misses_run_one_inference(tmp_path, yielding_locks):
+    # both the cache lock and the per-key locks yield on release
+    yielding_locks(cutout_cache)
+    inferences = []
+
+    def remove(image_bytes):
+        inferences.append(image_bytes)
+        time.sleep(0.05)
+        return b"png:" + image_bytes
+
+    cache = CutoutCache(str(tmp_path), remove)
+    start = threading.Barrier(16)
+    results = []
+
+    def get():
+        start.wait()
+        results.append(cache.remove(b"product"))
+
+    threads = [threading.Thread(target=get) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(inferences) == 1
+    assert results == [b"png:product"] * 16
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["hot_hits"] == 15
+
+
+def test_disk_hit_after_restart(tmp_path):
+    CutoutCache(str(tmp_path), lambda image_bytes: b"png").remove(b"product")
+    cache = CutoutCache(str(tmp_path), lambda image_bytes: 1 / 0)
+
+    assert cache.remove(b"product") == b"png"
+    assert cache.remove(b"product") == b"png"
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["hot_hits"] == 1
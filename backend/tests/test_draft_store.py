@@ -0,0 +1,97 @@
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from draft_store import DraftError, DraftStore
+
+
+class _Drafts:
+    """mongomock collection whose bulk_write applies UpdateOne ops one by one
+    (mongomock's own bulk_write does not accept current pymongo operations)."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, ops, ordered=True):
+        class Result:
+            upserted_count = modified_count = 0
+        result = Result()
+        for op in ops:
+            r = self.collection.update_one(op._filter, op._doc, upsert=op._upsert)
+            result.upserted_count += r.upserted_id is not None
+            result.modified_count += r.modified_count
+        return result
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["fashion_ai_test"]
+
+
+@pytest.fixture
+def drafts(db):
+    return DraftStore(_Drafts(db["drafts"]))
+
+
+def _ids(drafts, user_id):
+    page, _ = drafts.list(user_id)
+    return sorted(d["draft_id"] for d in page)
+
+
+def test_replace_all_deletes_drafts_left_out(drafts):
+    user_id = ObjectId()
+    drafts.save(user_id, "a", {"title": "A"})
+    drafts.save(user_id, "b", {"title": "B"})
+
+    saved, deleted = drafts.replace_all(user_id, [{"id": "b", "title": "B2"}, {"id": "c", "title": "C"}])
+
+    assert (saved, deleted) == (2, 1)
+    assert _ids(drafts, user_id) == ["b", "c"]
+    assert drafts.replace_all(user_id, []) == (0, 2)
+    assert _ids(drafts, user_id) == []
+
+
+def test_save_retries_as_update_when_a_concurrent_insert_wins(db, drafts, monkeypatch):
+    user_id = ObjectId()
+    find_one_and_update = db["drafts"].find_one_and_update
+
+    def racing(query, update, upsert=False, **kwargs):
+        if upsert:
+            # the other request's upsert inserts the draft first
+            find_one_and_update(query, {"$set": {"title": "other"}}, upsert=True)
+            raise DuplicateKeyError("E11000 duplicate key error")
+        return find_one_and_update(query, update, **kwargs)
+
+    monkeypatch.setattr(db["drafts"], "find_one_and_update", racing)
+    saved = drafts.save(user_id, "a", {"title": "mine"})
+
+    assert saved["draft_id"] == "a" and saved["title"] == "mine"
+    assert _ids(drafts, user_id) == ["a"]
+
+
+def test_replace_all_validates_before_writing(drafts):
+    user_id = ObjectId()
+    drafts.save(user_id, "a", {"title": "A"})
+
+    with pytest.raises(DraftError):
+        drafts.replace_all(user_id, [{"id": "b", "title": "B"}, "not a draft"])
+    with pytest.raises(DraftError):
+        drafts.replace_all(user_id, {"id": "b"})
+    assert _ids(drafts, user_id) == ["a"]
+
+
+def test_migration_skips_bad_drafts_and_keeps_going(db, drafts):
+    bad_user = db.users.insert_one({"drafts": [{"id": "ok", "title": "fine"}, {"id": "x", "$bad": 1}]}).inserted_id
+    good_user = db.users.insert_one({"drafts": [{"id": "1", "title": "one"}, {"title": "no id"}]}).inserted_id
+
+    assert drafts.migrate_embedded(db.users) == 3
+
+    assert _ids(drafts, bad_user) == ["ok"]
+    assert _ids(drafts, good_user) == ["1", "legacy-1"]
+    # the draft that failed validation stays on the user for a manual fix
+    assert db.users.find_one({"_id": bad_user})["drafts"] == [{"id": "x", "$bad": 1}]
+    assert "drafts" not in db.users.find_one({"_id": good_user})
@@ -0,0 +1,116 @@
+import time
+import threading
+
+import pytest
+
+import fake_heygen
+from heygen_jobs import (COMPLETED, FAILED, PROCESSING, QUEUED, SUBMITTING,
+                         HeyGenJobManager, JobStore, job_response)
+from provider_client import ProviderClient
+
+
+@pytest.fixture
+def heygen(monkeypatch):
+    monkeypatch.setattr(fake_heygen, "RENDER_SECONDS", 0)
+    fake_heygen.VIDEOS.clear()
+    fake_heygen.STATS.update(generate=0, status=0)
+    server = fake_heygen.serve(0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _manager(base_url, store, **kwargs):
+    client = ProviderClient("heygen", base_url, retries=0)
+    return HeyGenJobManager("test-key", store, client=client, **kwargs)
+
+
+def test_job_moves_queued_processing_completed(heygen):
+    store = JobStore(":memory:")
+    jobs = _manager(heygen, store)
+    job_id = store.create({"script": "hello"})
+    assert store.get(job_id)["status"] == QUEUED
+
+    jobs.tick()
+    job = store.get(job_id)
+    assert job["status"] == PROCESSING and job["video_id"]
+
+    jobs.tick()
+    job = store.get(job_id)
+    assert job["status"] == COMPLETED
+    assert job_response(job)["video_url"].endswith(f"{job['video_id']}.mp4")
+
+
+def test_failed_render_is_reported(heygen):
+    store = JobStore(":memory:")
+    jobs = _manager(heygen, store)
+    job_id = store.create({"script": "please fail"})
+    jobs.tick()
+    jobs.tick()
+    job = store.get(job_id)
+    assert job["status"] == FAILED and job_response(job)["error"]
+
+
+def test_pollers_sharing_a_store_submit_each_job_once(heygen, tmp_path):
+    path = str(tmp_path / "jobs.db")
+    # one JobStore (own connection) per manager, like one per gunicorn worker
+    managers = [_manager(heygen, JobStore(path), batch_size=50) for _ in range(4)]
+    job_ids = [managers[0].store.create({"script": f"video {i}"}) for i in range(20)]
+
+    barrier = threading.Barrier(len(managers))
+
+    def run(manager):
+        barrier.wait()
+        manager.tick()
+
+    threads = [threading.Thread(target=run, args=(m,)) for m in managers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert fake_heygen.STATS["generate"] == len(job_ids)
+    video_ids = {managers[0].store.get(job_id)["video_id"] for job_id in job_ids}
+    assert len(video_ids) == len(job_ids)
+
+
+def test_claim_is_exclusive():
+    store = JobStore(":memory:")
+    job_id = store.create({})
+    assert store.claim(job_id)
+    assert not store.claim(job_id)
+    assert store.get(job_id)["status"] == SUBMITTING
+
+
+def test_interrupted_submission_fails_instead_of_resubmitting(heygen):
+    store = JobStore(":memory:")
+    jobs = _manager(heygen, store, submit_lease=0)
+    job_id = store.create({"script": "hello"})
+    store.claim(job_id)  # a process claimed it and died before storing the video id
+    time.sleep(0.01)
+
+    jobs.tick()
+    assert store.get(job_id)["status"] == FAILED
+    assert fake_heygen.STATS["generate"] == 0
+
+
+def test_resume_picks_up_pending_jobs_after_restart(heygen, tmp_path):
+    path = str(tmp_path / "jobs.db")
+    job_id = JobStore(path).create({"script": "queued before the restart"})
+
+    jobs = _manager(heygen, JobStore(path), poll_interval=0.05)
+    assert jobs.resume()
+    try:
+        deadline = time.time() + 5
+        while jobs.store.get(job_id)["status"] != COMPLETED and time.time() < deadline:
+            time.sleep(0.05)
+        assert jobs.store.get(job_id)["status"] == COMPLETED
+    finally:
+        jobs.stop(timeout=2)
+
+
+def test_resume_is_a_no_op_without_pending_jobs(heygen):
+    jobs = _manager(heygen, JobStore(":memory:"))
+    assert not jobs.resume()
+    assert jobs._thread is None
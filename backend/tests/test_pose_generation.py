@@ -0,0 +1,79 @@
+import io
+import time
+
+import pytest
+from PIL import Image
+
+from bg_removal import PoolSaturated, RembgPool
+from pose_generation import FakeImageModel, PoseGenerator
+
+POSES = {"front": "front", "left": "left", "right": "right", "freestyle": "freestyle"}
+
+
+def _slow_cutout(image_bytes):
+    time.sleep(0.05)
+    return image_bytes
+
+
+def _no_init(model, threads):
+    pass
+
+
+def _small_pool():
+    # the capacity pool_from_env gives a 1-CPU host: 1 worker + 2 queued = 3 < 4 poses
+    return RembgPool(workers=0, queue_limit=2, task=_slow_cutout, initializer=_no_init)
+
+
+def _product():
+    return Image.new("RGBA", (16, 16), (255, 0, 0, 255))
+
+
+def _generator(pool, **kwargs):
+    return PoseGenerator(pool, load_model=lambda: FakeImageModel(latency=0.01, size=64), **kwargs)
+
+
+def test_one_request_fits_a_pool_smaller_than_its_pose_count():
+    pool = _small_pool()
+    results = {name: (encoded, error) for name, encoded, error in _generator(pool).generate(_product(), POSES)}
+
+    assert set(results) == set(POSES)
+    assert all(error is None for _, error in results.values())
+    assert all(encoded["image"].startswith(b"\x89PNG") for encoded, _ in results.values())
+    assert pool.stats()["rejected"] == 0
+    pool.shutdown()
+
+
+def test_pool_still_rejects_past_the_wait():
+    pool = _small_pool()
+    results = list(_generator(pool, rembg_wait=0).generate(_product(), POSES))
+
+    errors = [error for _, _, error in results if error]
+    assert errors and all(error.status == 503 and error.retry_after for error in errors)
+    assert pool.stats()["rejected"] == len(errors)
+    pool.shutdown()
+
+
+def test_failed_pose_is_reported_and_the_rest_stream():
+    class FlakyModel(FakeImageModel):
+        def predict(self, prompt, **kwargs):
+            if prompt == "left":
+                raise RuntimeError("quota exceeded")
+            return super().predict(prompt, **kwargs)
+
+    pool = _small_pool()
+    generator = PoseGenerator(pool, load_model=lambda: FlakyModel(latency=0.01, size=64))
+    results = {name: (encoded, error) for name, encoded, error in generator.generate(_product(), POSES)}
+
+    assert results["left"][0] is None and "quota exceeded" in str(results["left"][1])
+    assert all(results[name][1] is None for name in ("front", "right", "freestyle"))
+    pool.shutdown()
+
+
+def test_submit_wait_times_out_with_pool_saturated():
+    pool = RembgPool(workers=0, queue_limit=0, task=_slow_cutout, initializer=_no_init)
+    first = pool.submit(b"a")
+    with pytest.raises(PoolSaturated):
+        pool.submit(b"b", wait=0.001)
+    assert pool.submit(b"c", wait=5).result() == b"c"
+    first.result()
+    pool.shutdown()
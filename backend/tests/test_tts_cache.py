@@ -0,0 +1,46 @@
+import os
+import time
+import threading
+
+import tts_cache
+from tts_cache import TTSCache
+
+
+def _slow_synthesize(text, lang, tld, slow, fp):
+    time.sleep(0.05)
+    fp.write(text.encode("utf-8"))
+
+
+def test_concurrent_misses_synthesize_once(tmp_path, yielding_locks):
+    # both the cache lock and the per-key locks yield on release
+    yielding_locks(tts_cache)
+    cache = TTSCache(str(tmp_path), synthesize=_slow_synthesize)
+    writes = []
+    write = cache._write
+    cache._write = lambda *args: (writes.append(args), write(*args))
+
+    start = threading.Barrier(16)
+    paths = []
+
+    def get():
+        start.wait()
+        paths.append(cache.get("hello there"))
+
+    threads = [threading.Thread(target=get) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(writes) == 1
+    assert len(set(paths)) == 1 and os.path.exists(paths[0])
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 15
+
+
+def test_eviction_keeps_newest_under_budget(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=10, synthesize=_slow_synthesize)
+    first = cache.get("aaaaaa")
+    second = cache.get("bbbbbb")
+
+    assert not os.path.exists(first) and os.path.exists(second)
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bytes"] == 6
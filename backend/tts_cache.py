@@ -0,0 +1,138 @@
+# backend/tts_cache.py
+# Content-addressed cache for gTTS audio.
+#
+# Files are named by a hash of (text, lang, tld, slow), so a repeated preview
+# is served straight from disk with no round trip to Google. Writes go to a
+# temp file in the same directory and are renamed into place, so readers
+# never see a half-written mp3. The directory is kept under `max_bytes` by
+# evicting least-recently-used files (recency tracked in memory, seeded from
+# mtimes at startup).
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+def _gtts_synthesize(text, lang, tld, slow, fp):
+    from gtts import gTTS
+    gTTS(text=text, lang=lang, tld=tld, slow=slow).write_to_fp(fp)
+
+
+class TTSCache:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, synthesize=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.synthesize = synthesize or _gtts_synthesize
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = OrderedDict()  # filename -> size, oldest first
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    @staticmethod
+    def key(text, lang="en", tld="com", slow=False):
+        spec = f"{lang}|{tld}|{int(bool(slow))}|{text}"
+        return hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+    def _load_index(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.startswith("tts_") or not name.endswith(".mp3"):
+                continue
+            st = os.stat(os.path.join(self.directory, name))
+            files.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+
+    def filename(self, text, lang="en", tld="com", slow=False):
+        return f"tts_{self.key(text, lang, tld, slow)}.mp3"
+
+    def get(self, text, lang="en", tld="com", slow=False):
+        """Return the path of the cached mp3, synthesizing it on a miss."""
+        name = self.filename(text, lang, tld, slow)
+        path = os.path.join(self.directory, name)
+
+        with self._lock:
+            if name in self._entries and os.path.exists(path):
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return path
+            key_lock = self._key_locks.setdefault(name, threading.Lock())
+
+        # one synthesis per key; concurrent requests for the same audio wait
+        with key_lock:
+            with self._lock:
+                if name in self._entries and os.path.exists(path):
+                    self._entries.move_to_end(name)
+                    self.hits += 1
+                    return path
+                self.misses += 1
+            try:
+                self._write(path, text, lang, tld, slow)
+                # registered before the key lock is released, so a waiter (or a
+                # request that takes a fresh key lock) sees the entry and hits
+                with self._lock:
+                    size = os.path.getsize(path)
+                    self._bytes += size - self._entries.pop(name, 0)
+                    self._entries[name] = size
+                    self._evict(keep=name)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(name, None)
+        return path
+
+    def _write(self, path, text, lang, tld, slow):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp_", suffix=".mp3")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                self.synthesize(text, lang, tld, slow, fp)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _evict(self, keep):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                self._entries.move_to_end(name)
+                continue
+            self._entries.pop(name)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                log.warning("could not evict cached audio %s", name)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def cache_from_env(default_dir):
+    directory = os.getenv("TTS_CACHE_DIR", default_dir)
+    max_mb = float(os.getenv("TTS_CACHE_MAX_MB", 256))
+    return TTSCache(directory, max_bytes=int(max_mb * 1024 * 1024))
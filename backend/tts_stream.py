@@ -0,0 +1,147 @@
+# backend/tts_stream.py
+# Streaming TTS for long scripts.
+#
+# The script is split into sentence-sized chunks which are synthesized
+# concurrently on a small shared pool (at most `window` chunks in flight per
+# request) and yielded in order as soon as each one is ready. gTTS output is
+# plain MP3 frames, and gTTS itself joins its internal parts the same way, so
+# the chunks can be concatenated into one playable stream.
+#
+#   python tts_stream.py    # TTFB and total time, send_file vs. stream_tts,
+#                           # with a stub synthesizer (no network)
+import os
+import time
+import re
+from itertools import chain
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Response
+
+STREAM_WORKERS = int(os.getenv("TTS_STREAM_WORKERS", 8))
+STREAM_WINDOW = int(os.getenv("TTS_STREAM_WINDOW", 4))
+
+_pool = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="tts-stream")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+
+def split_sentences(text, max_chars=200, min_chars=40):
+    """Split on sentence boundaries, merging short pieces and breaking long ones on spaces."""
+    pieces = [p.strip() for p in _SENTENCE_END.split(text) if p and p.strip()]
+    chunks = []
+    for piece in pieces:
+        while len(piece) > max_chars:
+            cut = piece.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            chunks.append(piece[:cut].strip())
+            piece = piece[cut:].strip()
+        if chunks and len(chunks[-1]) < min_chars and len(chunks[-1]) + len(piece) + 1 <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {piece}"
+        elif piece:
+            chunks.append(piece)
+    return chunks
+
+
+def _read_chunk(tts_cache, chunk, lang, tld):
+    for _ in range(2):
+        try:
+            with open(tts_cache.get(chunk, lang=lang, tld=tld), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            continue  # evicted between get() and open(): synthesize again
+    raise RuntimeError("TTS cache evicted a chunk before it could be read")
+
+
+def stream_tts(tts_cache, text, lang="en", tld="com", window=None):
+    """Yield MP3 bytes chunk by chunk, in script order.
+
+    The first chunk is sent as soon as it is synthesized, so time-to-first-byte
+    no longer grows with script length. Chunks go through the TTS cache, so
+    sentences repeated across scripts are not synthesized twice.
+    """
+    window = window or STREAM_WINDOW
+    chunks = deque(split_sentences(text))
+    in_flight = deque()
+    try:
+        while chunks or in_flight:
+            while chunks and len(in_flight) < window:
+                in_flight.append(_pool.submit(_read_chunk, tts_cache, chunks.popleft(), lang, tld))
+            yield in_flight.popleft().result()
+    finally:
+        # client went away (generator closed) or a chunk failed: drop queued work
+        for future in in_flight:
+            future.cancel()
+
+
+def audio_stream_response(tts_cache, text, lang="en", tld="com"):
+    """Chunked audio/mpeg response for stream_tts()."""
+    audio = stream_tts(tts_cache, text, lang=lang, tld=tld)
+    # synthesize the first chunk eagerly so failures still become a JSON 500
+    first = next(audio, b"")
+    return Response(
+        chain([first], audio),
+        mimetype="audio/mpeg",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ===================== #
+#   TTFB BENCHMARK      #
+# ===================== #
+def _stub_synthesizer(per_call=0.15, per_char=0.002):
+    """Stands in for gTTS: a fixed round trip plus time proportional to the text
+    (gTTS synthesizes a long text as sequential ~100-character requests)."""
+    def synthesize(text, lang, tld, slow, fp):
+        time.sleep(per_call + per_char * len(text))
+        fp.write(b"\xff\xfb" + text.encode("utf-8"))
+    return synthesize
+
+
+def benchmark(sentence_counts=(2, 8, 32), repeats=3):
+    import tempfile
+    from flask import Flask, request, send_file
+    from tts_cache import TTSCache
+
+    def script(count):
+        # distinct sentences, so the per-chunk cache does not hide synthesis time
+        return " ".join(f"Look {i + 1} pairs soft neutrals with one bold accent colour." for i in range(count))
+
+    def measure(route, text):
+        # fresh cache each run: every request is a miss, as for a new script
+        with tempfile.TemporaryDirectory() as directory:
+            cache = TTSCache(directory, synthesize=_stub_synthesizer())
+            app = Flask("bench")
+
+            @app.route("/whole", methods=["POST"])
+            def whole():
+                return send_file(cache.get(request.get_json()["text"]), mimetype="audio/mpeg")
+
+            @app.route("/stream", methods=["POST"])
+            def streamed():
+                return audio_stream_response(cache, request.get_json()["text"])
+
+            client = app.test_client()
+            started = time.perf_counter()
+            response = client.post(route, json={"text": text}, buffered=False)
+            body = iter(response.response)
+            first = next(body, b"")
+            ttfb = time.perf_counter() - started
+            size = len(first) + sum(len(part) for part in body)
+            total = time.perf_counter() - started
+            response.close()
+            return ttfb, total, size
+
+    print(f"TTS response, stub synthesizer (150 ms + 2 ms/char per call), "
+          f"{STREAM_WINDOW} chunks in flight, best of {repeats}")
+    for count in sentence_counts:
+        text = script(count)
+        rows = []
+        for label, route in (("send_file", "/whole"), ("stream_tts", "/stream")):
+            ttfb, total, size = min(measure(route, text) for _ in range(repeats))
+            rows.append(f"{label}: TTFB {ttfb * 1000:6.0f} ms  total {total * 1000:6.0f} ms")
+        print(f"  {count:>3} sentences ({len(text):>5} chars)   " + "   ".join(rows))
+
+
+if __name__ == "__main__":
+    benchmark()
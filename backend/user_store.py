@@ -0,0 +1,166 @@
+# backend/user_store.py
+# MongoDB client and `users` collection setup for the auth/profile routes.
+#
+# - One pooled MongoClient per process with explicit pool size and timeouts
+#   (MONGO_* env vars), so a slow or unreachable cluster fails fast instead of
+#   hanging request threads for pymongo's 30s defaults.
+# - Indexes are provisioned by provision_db.py, which avatar_server.py runs in
+#   the background on every boot (create_indexes is a no-op once they exist).
+#   The unique index on `email` turns login into an index lookup and makes
+#   register race-free: the insert itself rejects a duplicate.
+# - UserStore: the queries the auth/profile routes make, each pulling only the
+#   fields it needs.
+#
+#   python user_store.py [--users 1000000]   # login latency benchmark
+#   MONGO_BENCH_URI=mongodb://localhost:27017 ...  (mongomock otherwise)
+import os
+import time
+import logging
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+log = logging.getLogger(__name__)
+
+USER_INDEXES = [
+    IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+]
+
+# login only needs the hash (+ _id, always returned)
+LOGIN_PROJECTION = {"password": 1}
+
+
+def mongo_client_from_env(uri, **overrides):
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 50)),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_MS", 60_000)),
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2_000)),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5_000)),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000)),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 10_000)),
+        "retryWrites": True,
+        "appname": os.getenv("MONGO_APP_NAME", "innova-backend"),
+    }
+    options.update(overrides)
+    return MongoClient(uri, **options)
+
+
+def ensure_indexes(collection, indexes=USER_INDEXES):
+    """Create missing indexes (a no-op when they exist). Never raises: the
+    server still starts if e.g. existing duplicate emails block the unique index."""
+    try:
+        names = collection.create_indexes(indexes)
+        log.info("indexes on %s: %s", collection.name, ", ".join(names))
+        return True
+    except OperationFailure as e:
+        log.error("could not create indexes on %s: %s", collection.name, e)
+    except Exception as e:
+        log.warning("index provisioning skipped for %s (database unavailable?): %s", collection.name, e)
+    return False
+
+
+class UserStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        return ensure_indexes(self.collection)
+
+    def exists(self, email):
+        # _id-only lookup on the unique email index
+        return self.collection.find_one({"email": email}, {"_id": 1}) is not None
+
+    def create(self, user):
+        """Insert a new user; returns its _id, or None if the email is taken
+        (e.g. lost a race with a concurrent register)."""
+        try:
+            return self.collection.insert_one(user).inserted_id
+        except DuplicateKeyError:
+            return None
+
+    def find_for_login(self, email):
+        return self.collection.find_one({"email": email}, LOGIN_PROJECTION)
+
+    def replace_password(self, user_id, old_hash, new_hash):
+        # only if the hash is still the one that was checked
+        self.collection.update_one({"_id": user_id, "password": old_hash}, {"$set": {"password": new_hash}})
+
+    def update_profile(self, user_id, fields):
+        """$set `fields` in one round trip; returns only those fields (+ _id as
+        a string), or None for an unknown user."""
+        user = self.collection.find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$set": fields},
+            projection=dict.fromkeys(fields, 1),
+            return_document=ReturnDocument.AFTER,
+        )
+        if user:
+            user["_id"] = str(user["_id"])
+        return user
+
+
+# ===================== #
+#   LOGIN BENCHMARK     #
+# ===================== #
+def benchmark(users=1_000_000, lookups=2_000, scan_lookups=20, batch=10_000):
+    uri = os.getenv("MONGO_BENCH_URI")
+    if uri:
+        client = mongo_client_from_env(uri)
+        backend = uri
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+        backend = "mongomock (in-process; indexes are not used for lookups)"
+    collection = client["fashion_ai_bench"]["users"]
+    collection.drop()
+
+    # bcrypt-sized hash + the profile fields register_user writes
+    fake_hash = "$2b$12$" + "x" * 53
+    t = time.perf_counter()
+    for start in range(0, users, batch):
+        collection.insert_many([{
+            "name": f"User {i}", "email": f"user{i}@example.com", "password": fake_hash,
+            "phone": "", "username": "", "socialLinks": {"tiktok": "", "facebook": "", "instagram": ""},
+            "privacy": {"twoFactorAuth": False, "dataSharing": False},
+        } for i in range(start, min(start + batch, users))], ordered=False)
+    print(f"{backend}\n{users:,} users inserted in {time.perf_counter() - t:.1f}s")
+
+    def measure(n, projection):
+        times = []
+        for j in range(n):
+            email = f"user{(j * 7919) % users}@example.com"
+            t = time.perf_counter()
+            assert collection.find_one({"email": email}, projection)
+            times.append(time.perf_counter() - t)
+        times.sort()
+        return times[len(times) // 2] * 1000, times[min(len(times) - 1, int(len(times) * 0.99))] * 1000
+
+    p50, p99 = measure(scan_lookups, None)
+    print(f"  no index, full document:   p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  ({scan_lookups} logins)")
+    t = time.perf_counter()
+    ensure_indexes(collection)
+    print(f"  email_unique built in {time.perf_counter() - t:.1f}s")
+    p50, p99 = measure(lookups, None)
+    print(f"  index, full document:      p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  ({lookups} logins)")
+    p50, p99 = measure(lookups, LOGIN_PROJECTION)
+    print(f"  index, login projection:   p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  ({lookups} logins)")
+
+    from pymongo.errors import DuplicateKeyError
+    try:
+        collection.insert_one({"email": "user0@example.com"})
+        print("  duplicate register: NOT rejected")
+    except DuplicateKeyError:
+        print("  duplicate register: rejected by email_unique")
+    collection.drop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Login lookup latency with and without the email index")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    args = parser.parse_args()
+    benchmark(users=args.users, lookups=args.lookups)
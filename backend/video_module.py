@@ -1,20 +1,52 @@
 from flask import Flask, request, send_file, jsonify
 from flask_cors import CORS
-from gtts import gTTS
 import os
-import uuid
-import requests
+import shutil
+import threading
+from provider_client import get_client, provider_stats
+from tts_cache import cache_from_env
 
 app = Flask(__name__)
 CORS(app)
 
 # --- Configuration ---
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta2/models/gemini-2.5-flash:generateText"
+GEMINI_URL = "/v1beta2/models/gemini-2.5-flash:generateText"
+gemini = get_client("gemini")
 VOICE_FOLDER = "voices"
 
-# Ensure voice folder exists
+# Ensure voice folder exists. Generated audio is cached by content hash in its own
+# directory (TTS_CACHE_DIR, size-capped and evicted); files handed out as
+# /voices/<filename> links are published into VOICE_FOLDER, which is never evicted
 os.makedirs(VOICE_FOLDER, exist_ok=True)
+tts_cache = cache_from_env(os.path.join(os.getcwd(), "tts_cache"))
+
+
+def _link_or_copy(src, dst):
+    # a hard link shares the bytes, and evicting the cache entry later leaves it in place;
+    # if src was already evicted, copyfile raises FileNotFoundError and publish_voice retries
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)  # e.g. the cache is on another filesystem
+
+
+def publish_voice(text, lang="en"):
+    """Synthesize (or reuse) the audio and make it servable; returns its filename."""
+    for _ in range(2):
+        path = tts_cache.get(text, lang=lang)
+        filename = os.path.basename(path)
+        target = os.path.join(VOICE_FOLDER, filename)
+        if os.path.exists(target):
+            return filename
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            _link_or_copy(path, tmp)
+        except FileNotFoundError:
+            continue  # evicted between get() and publishing: synthesize again
+        os.replace(tmp, target)
+        return filename
+    raise RuntimeError("TTS cache evicted the audio before it could be published")
 
 # --------------------------
 # Route: Generate TTS
@@ -26,13 +58,8 @@ def generate_voice():
     if not text:
         return jsonify({"error": "No text provided"}), 400
 
-    # Generate unique filename
-    filename = f"voice_{uuid.uuid4().hex}.mp3"
-    filepath = os.path.join(VOICE_FOLDER, filename)
-
-    # Generate TTS
-    tts = gTTS(text=text, lang="en")
-    tts.save(filepath)
+    # Content-addressed: the same text reuses the already generated file
+    filename = publish_voice(text, lang="en")
 
     return jsonify({"url": f"/voices/{filename}"}), 200
 
@@ -68,7 +95,7 @@ def enhance_script():
         "max_output_tokens": 500
     }
 
-    response = requests.post(GEMINI_URL, headers=headers, json=payload)
+    response = gemini.post(GEMINI_URL, headers=headers, json=payload)
     if response.status_code != 200:
         return jsonify({"error": "AI generation failed", "details": response.text}), 500
 
@@ -80,6 +107,13 @@ def enhance_script():
 
     return jsonify({"script": enhanced_script})
 
+# --------------------------
+# Route: Outbound provider metrics
+# --------------------------
+@app.get("/provider-stats")
+def get_provider_stats():
+    return jsonify({**provider_stats(), "tts_cache": tts_cache.stats()})
+
 
 if __name__ == "__main__":
     app.run(port=5001, debug=True)